@@ -1,40 +1,69 @@
+import threading
 from gpiozero import Servo, LED, Buzzer
 from time import sleep
 from config import PIN_SERVO, PIN_LIGHT, PIN_BUZZER,PIN_BUZZER_2, SERVO_OPEN_DC, SERVO_CLOSED_DC
 from utils import log_event
+from devices import device
 
-# Servo setup
-servo = Servo(PIN_SERVO)
-light = LED(PIN_LIGHT)
-buzzer = Buzzer(PIN_BUZZER)
-buzzer_2 = Buzzer(PIN_BUZZER_2)
+# GPIO pins are claimed on first use, not at import
+get_servo = device("servo", lambda: Servo(PIN_SERVO))
+get_light = device("light", lambda: LED(PIN_LIGHT))
+get_buzzers = device("buzzers", lambda: (Buzzer(PIN_BUZZER), Buzzer(PIN_BUZZER_2)))
 
 def servo_open():
     log_event("Opening gate")
+    servo = get_servo()
     servo.value = SERVO_OPEN_DC  # approximate open position
     sleep(1)
     servo.value = None
 
 def servo_close():
     log_event("Closing gate")
+    servo = get_servo()
     servo.value = SERVO_CLOSED_DC  # approximate closed position
     sleep(1)
     servo.value = None
 
 def light_on():
-    light.on()
+    get_light().on()
     log_event("Light ON")
 
 def light_off():
-    light.off()
+    get_light().off()
     log_event("Light OFF")
 
 def buzzer_on():
-    buzzer.on()
-    buzzer_2.on()
+    for buzzer in get_buzzers():
+        buzzer.on()
     log_event("Buzzer ON")
 
 def buzzer_off():
-    buzzer.off()
-    buzzer_2.off()
+    for buzzer in get_buzzers():
+        buzzer.off()
     log_event("Buzzer OFF")
+
+# === Shared alarm outputs ===
+# Smoke, flame, intruder and denied-card alarms share the buzzer and light.
+# Each holds them under its own name and an output goes off only when its last
+# holder releases it, so one alarm's reset can't silence another still active.
+_holders = {"buzzer": set(), "light": set()}
+_holders_lock = threading.Lock()
+_SWITCH = {"buzzer": (buzzer_on, buzzer_off), "light": (light_on, light_off)}
+
+def hold_outputs(owner, buzzer=True, light=True):
+    """Turn the buzzer and/or light on for `owner` until release_outputs(owner)."""
+    with _holders_lock:
+        for output, wanted in (("buzzer", buzzer), ("light", light)):
+            if wanted and owner not in _holders[output]:
+                _holders[output].add(owner)
+                if len(_holders[output]) == 1:
+                    _SWITCH[output][0]()
+
+def release_outputs(owner):
+    """Drop `owner`'s hold; outputs nobody else holds are turned off."""
+    with _holders_lock:
+        for output, holders in _holders.items():
+            if owner in holders:
+                holders.discard(owner)
+                if not holders:
+                    _SWITCH[output][1]()
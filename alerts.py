@@ -0,0 +1,88 @@
+"""
+Alert coalescing.
+
+The first event of a kind is sent straight away and opens a cooldown window
+for that kind. Further events inside the window are only counted (and their
+images considered); when the window closes, one summary notification goes
+out with the count and the best image seen.
+"""
+import os
+import time
+import threading
+from scheduler import call_later
+from config import ALERT_COALESCE_WINDOW, ALERT_COOLDOWNS
+from gsm_module import send_sms, send_image_mms, PRIORITY_ALERT
+from utils import log_event
+
+_lock = threading.Lock()
+_windows = {}  # kind -> pending window state
+
+def _image_score(image_path):
+    """Bigger JPEGs carry more detail; a cheap proxy for the most useful frame."""
+    try:
+        return os.path.getsize(image_path)
+    except (OSError, TypeError):
+        return -1
+
+def report_alert(kind, sms_text=None, image_path=None, mms_caption=None, priority=PRIORITY_ALERT):
+    """Send an alert now, or merge it into the open window for `kind`.
+
+    Returns True if a notification was sent immediately, False if merged.
+    """
+    cooldown = ALERT_COOLDOWNS.get(kind, ALERT_COALESCE_WINDOW)
+    with _lock:
+        window = _windows.get(kind)
+        if window is None:
+            _windows[kind] = {
+                "opened": time.time(),
+                "suppressed": 0,
+                "sms_text": sms_text,
+                "mms_caption": mms_caption,
+                "image": None,
+                "score": -1,
+                "priority": priority,
+                "job": call_later(cooldown, _close_window, kind),
+            }
+        else:
+            window["suppressed"] += 1
+            window["priority"] = min(window["priority"], priority)
+            score = _image_score(image_path)
+            if score > window["score"]:
+                window["image"], window["score"] = image_path, score
+            suppressed = window["suppressed"]
+
+    if window is not None:
+        log_event(f"Alert '{kind}' coalesced ({suppressed} suppressed in window)",
+                  event_type="alert_suppressed", source="alerts", image=image_path)
+        return False
+
+    _send(sms_text, image_path, mms_caption, priority)
+    return True
+
+def reset_windows():
+    """Drop every open cooldown window (and its pending summary), so the next alert of each kind goes out at once."""
+    with _lock:
+        windows = list(_windows.values())
+        _windows.clear()
+    for window in windows:
+        window["job"].cancel()
+
+def _close_window(kind):
+    with _lock:
+        window = _windows.pop(kind, None)
+    if not window or not window["suppressed"]:
+        return
+    count = window["suppressed"]
+    elapsed = int(time.time() - window["opened"])
+    note = f"{count} more event(s) in the last {elapsed}s"
+    log_event(f"Alert '{kind}' summary: {note}", event_type="alert_summary", source="alerts",
+              image=window["image"])
+    sms_text = f"{window['sms_text']} ({note})" if window["sms_text"] else None
+    caption = f"{window['mms_caption']} ({note})" if window["mms_caption"] else None
+    _send(sms_text, window["image"], caption, window["priority"])
+
+def _send(sms_text, image_path, mms_caption, priority):
+    if sms_text:
+        send_sms(sms_text, priority=priority)
+    if image_path and mms_caption:
+        send_image_mms(image_path, mms_caption, priority=priority)
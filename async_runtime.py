@@ -0,0 +1,110 @@
+"""
+Single event-loop runtime (opt-in: SMART_HOME_RUNTIME=asyncio).
+
+run() starts one asyncio loop and registers it with utils.set_event_loop()
+before any subsystem starts, so the scheduler, event bus handlers, sensor
+lanes, camera capture, RFID reader and modem worker start as tasks on that
+loop instead of threads. Bounded pools sit behind it:
+
+    worker pool  (ASYNC_EXECUTOR_WORKERS)  bus handlers, modem bookkeeping
+    driver pool  (ASYNC_DRIVER_WORKERS)    DHT and smoke reads, camera frames, card reads, MMS streaming
+    scheduler    (1 thread)                timer callbacks, in order, never queued behind a handler
+
+A probe measures how late the loop wakes up (loop lag), which bounds the
+added latency of every task on it. Still on their own threads: the CLI (a
+command may wait on the user for as long as it likes), gpiozero's edge
+callbacks (they only publish), the live view HTTP server and the log writer.
+"""
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import ASYNC_EXECUTOR_WORKERS, ASYNC_DRIVER_WORKERS, LOOP_LAG_INTERVAL
+from utils import log_event, set_event_loop, event_loop
+
+ready = threading.Event()  # set once start() has returned
+
+_lag = {"probes": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+
+def run(start, handle_command=None):
+    """Run start() with the loop installed, then the control interface until it quits.
+
+    Without handle_command the loop runs until interrupted.
+    """
+    asyncio.run(_main(start, handle_command))
+
+async def _main(start, handle_command):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(ASYNC_EXECUTOR_WORKERS, thread_name_prefix="loop-worker"))
+    set_event_loop(loop, ThreadPoolExecutor(ASYNC_DRIVER_WORKERS, thread_name_prefix="driver"))
+    asyncio.create_task(_probe_lag(LOOP_LAG_INTERVAL))
+    try:
+        await loop.run_in_executor(None, start)  # start() blocks while devices open
+        ready.set()
+        log_event(f"asyncio runtime up: {len(asyncio.all_tasks())} tasks, "
+                  f"{threading.active_count()} threads")
+        if handle_command is None:
+            await asyncio.Event().wait()
+        else:
+            await _control(loop, handle_command)
+    finally:
+        set_event_loop(None)
+
+async def _probe_lag(interval):
+    """Sleep `interval` and record how much later than that the loop woke up."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.monotonic() - started - interval)
+        _lag["probes"] += 1
+        _lag["total"] += lag
+        _lag["max"] = max(_lag["max"], lag)
+        _lag["last"] = lag
+
+# === Control interface ===
+async def _control(loop, handle_command):
+    """Run the CLI on its own thread and return when it quits."""
+    done = loop.create_future()
+
+    def cli():
+        error = None
+        try:
+            while handle_command(input("Command> ").strip().lower()):
+                pass
+        except EOFError:
+            pass  # stdin closed
+        except Exception as e:
+            error = e
+        loop.call_soon_threadsafe(_settle, done, error)
+
+    threading.Thread(target=cli, name="cli", daemon=True).start()
+    await done
+
+def _settle(future, error):
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+# === Stats ===
+def runtime_stats():
+    loop = event_loop()
+    n = _lag["probes"] or 1
+    return {
+        "tasks": len(asyncio.all_tasks(loop)) if loop is not None else 0,
+        "threads": threading.active_count(),
+        "lag_probes": _lag["probes"],
+        "lag_avg_ms": _lag["total"] / n * 1000,
+        "lag_max_ms": _lag["max"] * 1000,
+        "lag_last_ms": _lag["last"] * 1000,
+    }
+
+def print_runtime_stats():
+    if event_loop() is None:
+        print(f"Thread runtime: {threading.active_count()} threads "
+              f"({', '.join(sorted({t.name.rstrip('0123456789-_') for t in threading.enumerate()}))})")
+        return
+    s = runtime_stats()
+    print(f"asyncio runtime: {s['tasks']} tasks, {s['threads']} threads")
+    print(f"loop lag over {s['lag_probes']} probes: avg {s['lag_avg_ms']:.2f} ms, "
+          f"max {s['lag_max_ms']:.2f} ms, last {s['lag_last_ms']:.2f} ms")
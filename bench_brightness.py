@@ -0,0 +1,28 @@
+"""
+Benchmark: cached/subsampled brightness estimate vs. the original is_dark() math.
+
+    python bench_brightness.py
+"""
+import timeit
+import numpy as np
+from vision import estimate_brightness
+
+FRAME_SIZES = [(480, 640), (720, 1280), (1080, 1920), (1944, 2592)]
+
+def legacy_brightness(frame):
+    gray = np.mean(frame, axis=2)
+    return np.mean(gray)
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'frame':>12} {'legacy ms':>10} {'new ms':>8} {'speedup':>8} {'diff':>6}")
+    for h, w in FRAME_SIZES:
+        frame = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+        n = 20
+        legacy = timeit.timeit(lambda: legacy_brightness(frame), number=n) / n * 1000
+        new = timeit.timeit(lambda: estimate_brightness(frame), number=n) / n * 1000
+        diff = abs(legacy_brightness(frame) - estimate_brightness(frame))
+        print(f"{w:>5}x{h:<6} {legacy:>10.2f} {new:>8.3f} {legacy / new:>7.0f}x {diff:>6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+End-to-end latency benchmarks on simulated hardware (runs on any Linux box).
+
+    PIR edge -> buzzer on        motion bus, camera verification, actuators
+    PIR edge -> SMS accepted     alert path, outbox, modem worker, AT dialogue
+    RFID scan -> session active  reader loop, bus, session tracking
+    ...during a denied burst     same, right after a burst of unknown cards
+    event bus burst              publish rate and drops with a no-op handler
+    log burst                    log_event rate and records reaching the store
+
+    python bench_latency.py [runs]
+    SMART_HOME_RUNTIME=asyncio python bench_latency.py [runs]
+
+Logs, images, the outbox and the whitelist go to a throwaway directory.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SMART_HOME_LOG_DIR", tempfile.mkdtemp(prefix="smart_home_bench_"))
+os.environ["SMART_HOME_DEVICES"] = "sim"
+os.chdir(os.environ["SMART_HOME_LOG_DIR"])  # relative data files (whitelist) stay out of the repo
+
+import time
+import threading
+import statistics
+import sim_devices
+
+sim_devices.install()
+
+import main
+import async_runtime
+import alerts
+import actuators
+import whitelist
+import sessions
+from event_bus import subscribe, publish, bus_stats
+from event_store import query_events
+from utils import log_event, flush_log
+from config import RUNTIME
+
+TIMEOUT = 15
+BURST = 20000
+BENCH_UIDS = [str(424200 + i) for i in range(50)]
+
+def _wait_for(condition, timeout=TIMEOUT, poll=0.0005):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(poll)
+    return False
+
+def _summary(name, samples_ms):
+    if not samples_ms:
+        return f"{name:<28} {'no samples':>10}"
+    ordered = sorted(samples_ms)
+    return (f"{name:<28} {len(ordered):>5} {ordered[0]:>9.1f} {statistics.median(ordered):>9.1f} "
+            f"{ordered[-1]:>9.1f} {statistics.mean(ordered):>9.1f}")
+
+def bench_pir(runs):
+    """PIR edge -> buzzer on, and -> intruder SMS accepted by the modem."""
+    buzzer_on = threading.Event()
+    sms_in = threading.Event()
+    stamps = {}
+
+    def on_buzzer(output, state, now):
+        if state and not buzzer_on.is_set():
+            stamps["buzzer"] = now
+            buzzer_on.set()
+
+    def on_message(message):
+        if message["kind"] == "sms" and "Unauthorized motion" in message.get("text", ""):
+            stamps["sms"] = message["time"]
+            sms_in.set()
+
+    sim_devices.buzzers[0].on_change.append(on_buzzer)
+    sim_devices.modem.on_message.append(on_message)
+    to_buzzer, to_sms = [], []
+    for _ in range(runs):
+        alerts.reset_windows()  # every run is a fresh first alert, not a coalesced one
+        actuators.release_outputs("intruder")  # ...and switches the buzzer on again
+        buzzer_on.clear()
+        sms_in.clear()
+        started = time.time()
+        sim_devices.pirs["pir1"].trigger()
+        if buzzer_on.wait(TIMEOUT):
+            to_buzzer.append((stamps["buzzer"] - started) * 1000)
+        if sms_in.wait(TIMEOUT):
+            to_sms.append((stamps["sms"] - started) * 1000)
+        time.sleep(2.5)  # let the synthetic scene settle back into the background
+    return to_buzzer, to_sms
+
+def bench_rfid(runs):
+    """Authorized RFID scan -> session present in the session store.
+
+    A different card each run, back to back (the same card would be debounced).
+    """
+    samples = []
+    for i in range(runs):
+        uid = BENCH_UIDS[i % len(BENCH_UIDS)]
+        whitelist.add(uid, f"Bench User {i}")
+        started = time.time()
+        sim_devices.rfid.scan(uid)
+        if _wait_for(lambda: uid in sessions.snapshot()):
+            samples.append((time.time() - started) * 1000)
+        main.remove_authorized_user(uid, "benchmark")
+    return samples
+
+def bench_rfid_denied_burst(runs, burst=10):
+    """Authorized scan -> session right after `burst` unknown cards were tried."""
+    samples = []
+    for i in range(runs):
+        for j in range(burst):
+            sim_devices.rfid.scan(900000 + i * burst + j)
+        uid = BENCH_UIDS[-1 - i % len(BENCH_UIDS)]
+        whitelist.add(uid, f"Bench Resident {i}")
+        started = time.time()
+        sim_devices.rfid.scan(uid)
+        if _wait_for(lambda: uid in sessions.snapshot()):
+            samples.append((time.time() - started) * 1000)
+        main.remove_authorized_user(uid, "benchmark")
+    return samples
+
+def bench_bus(n=BURST):
+    """Publish a burst to a no-op handler. Returns (publish/s, handled/s, dropped)."""
+    subscribe("bench", lambda event: None)
+    stats = lambda: next(s for s in bus_stats() if s["event"] == "bench")
+    started = time.perf_counter()
+    for i in range(n):
+        publish("bench", seq=i)
+    published = time.perf_counter() - started
+    _wait_for(lambda: stats()["processed"] + stats()["dropped"] >= n and stats()["depth"] == 0)
+    handled = time.perf_counter() - started
+    s = stats()
+    return n / published, s["processed"] / handled, s["dropped"]
+
+def bench_log(n=BURST):
+    """log_event burst. Returns (calls/s, end-to-end records/s, records stored)."""
+    flush_log()
+    start_ts = time.time()
+    started = time.perf_counter()
+    for i in range(n):
+        log_event(f"bench {i}", event_type="bench_log", source="bench")
+    called = time.perf_counter() - started
+    flush_log(timeout=60)
+    stored = sum(1 for _ in query_events(start_ts, time.time() + 1, "bench_log"))
+    return n / called, stored / (time.perf_counter() - started), stored
+
+def run(runs=5):
+    out = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # the system's own log lines
+    try:
+        if RUNTIME == "asyncio":
+            threading.Thread(target=async_runtime.run, args=(main.start_subsystems,),
+                             name="event-loop", daemon=True).start()
+            async_runtime.ready.wait(TIMEOUT)
+        else:
+            main.start_subsystems()
+        time.sleep(1.0)  # camera ring fills, modem opens
+        to_buzzer, to_sms = bench_pir(runs)
+        to_session = bench_rfid(runs)
+        to_session_burst = bench_rfid_denied_burst(runs)
+        bus = bench_bus()
+        log = bench_log()
+        threads = threading.active_count()
+        loop = async_runtime.runtime_stats()
+    finally:
+        sys.stdout.close()
+        sys.stdout = out
+
+    print(f"{'latency (ms)':<28} {'runs':>5} {'min':>9} {'median':>9} {'max':>9} {'mean':>9}")
+    print(_summary("PIR edge -> buzzer on", to_buzzer))
+    print(_summary("PIR edge -> SMS accepted", to_sms))
+    print(_summary("RFID scan -> session active", to_session))
+    print(_summary("  ...after 10 denied scans", to_session_burst))
+    missing = [(name, len(samples)) for name, samples in
+               (("PIR edge -> buzzer on", to_buzzer), ("PIR edge -> SMS accepted", to_sms),
+                ("RFID scan -> session active", to_session), ("  ...after 10 denied scans", to_session_burst))
+               if len(samples) < runs]
+    print()
+    print(f"event bus burst ({BURST}): {bus[0]:,.0f} publish/s, {bus[1]:,.0f} handled/s, {bus[2]} dropped")
+    print(f"log burst ({BURST}): {log[0]:,.0f} log_event/s, {log[1]:,.0f} stored/s, "
+          f"{log[2]} of {BURST} stored")
+    print(f"{RUNTIME} runtime: {threads} threads", end="")
+    if RUNTIME == "asyncio":
+        print(f", {loop['tasks']} tasks, loop lag avg {loop['lag_avg_ms']:.2f} ms "
+              f"max {loop['lag_max_ms']:.2f} ms", end="")
+    print(f"\nlogs: {os.environ['SMART_HOME_LOG_DIR']}")
+    for name, got in missing:
+        print(f"WARNING: {name.strip()}: only {got} of {runs} runs completed within {TIMEOUT}s",
+              file=sys.stderr)
+    return not missing
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 5) else 1)
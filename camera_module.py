@@ -1,64 +1,205 @@
 import os
+import time
+import threading
 from datetime import datetime
 import numpy as np
-from picamera2 import Picamera2, Preview
-from config import BRIGHTNESS_THRESHOLD
-from utils import log_event
+import cv2
+from config import (LOG_DIR, CAMERA_PREVIEW, BRIGHTNESS_THRESHOLD, BRIGHTNESS_SAMPLE_STEP, BRIGHTNESS_CACHE_TTL,
+                    CAMERA_RING_SIZE, CAMERA_CAPTURE_FPS, LIVE_VIEW_JPEG_QUALITY)
+from utils import log_event, event_loop, start_task, run_blocking
+from vision import estimate_brightness
+from devices import device
 
-# Global camera instance
-camera = None
+# === Frame ring buffer ===
+# Filled by one capture thread (or task, under the asyncio runtime); readers
+# copy out the slot they need.
+_ring = None                # preallocated (N, H, W, C) array, sized on first frame
+_ring_ts = np.zeros(CAMERA_RING_SIZE)
+_ring_count = 0             # total frames written; newest is (_ring_count - 1) % N
+_ring_lock = threading.Lock()
+_frame_added = threading.Condition(_ring_lock)  # notified after every frame
+_capture_thread = None
+_capture_task = None        # Future of the capture task (asyncio runtime)
+_capture_stop = threading.Event()
 
-def init_camera():
+_brightness_cache = (None, 0.0)  # (value, monotonic time)
+
+# Newest frame encoded as JPEG, shared by every consumer of get_frame()
+_jpeg_cache = (None, None)  # (frame timestamp, bytes)
+_jpeg_lock = threading.Lock()
+
+def _open_camera():
     """Initialize the Raspberry Pi camera."""
-    global camera
-    if camera is None:
-        camera = Picamera2()
-        camera.start_preview(Preview.QTGL)  # Optional, can remove if no GUI
-        camera.start()
-        log_event("Camera initialized successfully.")
+    from picamera2 import Picamera2, Preview
+    camera = Picamera2()
+    if CAMERA_PREVIEW:
+        camera.start_preview(Preview.QTGL)
+    camera.start()
+    log_event("Camera initialized successfully.")
+    return camera
+
+get_camera = device("camera", _open_camera)
+
+def start_capture(source=None, fps=CAMERA_CAPTURE_FPS):
+    """Start the background capture thread (a task under the asyncio runtime).
+
+    `source` is a callable returning one frame (an ndarray); it defaults to the
+    Pi camera and can be a synthetic generator for testing.
+    """
+    global _capture_thread, _capture_task
+    if _capture_thread is not None or _capture_task is not None:
+        return
+    if source is None:
+        source = get_camera().capture_array
+    _capture_stop.clear()
+    if event_loop() is not None:
+        _capture_task = start_task(_capture_async(source, fps))
+        return
+    _capture_thread = threading.Thread(target=_capture_loop, args=(source, fps),
+                                       name="camera-capture", daemon=True)
+    _capture_thread.start()
+
+def stop_capture():
+    global _capture_thread, _capture_task
+    _capture_stop.set()
+    if _capture_thread is not None:
+        _capture_thread.join(timeout=2)
+    if _capture_task is not None:
+        _capture_task.cancel()
+    _capture_thread = _capture_task = None
+
+def _grab(source):
+    """Capture one frame into the ring."""
+    global _ring, _ring_count
+    try:
+        frame = source()
+    except Exception as e:
+        log_event(f"Camera capture error: {e}")
+        return
+    if frame is None:
+        return
+    with _ring_lock:
+        if _ring is None or _ring.shape[1:] != frame.shape or _ring.dtype != frame.dtype:
+            _ring = np.empty((CAMERA_RING_SIZE,) + frame.shape, dtype=frame.dtype)
+            _ring_count = 0
+        slot = _ring_count % CAMERA_RING_SIZE
+        np.copyto(_ring[slot], frame)
+        _ring_ts[slot] = time.time()
+        _ring_count += 1
+        _frame_added.notify_all()
+
+def _capture_loop(source, fps):
+    period = 1.0 / fps
+    while not _capture_stop.is_set():
+        started = time.monotonic()
+        _grab(source)
+        _capture_stop.wait(max(0.0, period - (time.monotonic() - started)))
+
+async def _capture_async(source, fps):
+    import asyncio
+    period = 1.0 / fps
+    while True:
+        started = time.monotonic()
+        await run_blocking(_grab, source)  # the capture and the copy stay off the loop
+        await asyncio.sleep(max(0.0, period - (time.monotonic() - started)))
+
+def latest_frame():
+    """Return (frame, timestamp) for the newest buffered frame, or (None, None)."""
+    if _capture_thread is None and _capture_task is None:
+        # No capture thread: fall back to a direct grab
+        try:
+            return get_camera().capture_array(), time.time()
+        except Exception:
+            return None, None  # already logged by the device accessor
+    with _ring_lock:
+        if _ring_count == 0:
+            return None, None
+        slot = (_ring_count - 1) % CAMERA_RING_SIZE
+        return _ring[slot].copy(), _ring_ts[slot]
 
-# Call once at startup
-init_camera()
+def wait_for_frame(after_ts, timeout):
+    """Block until a frame captured after `after_ts` is buffered. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    with _frame_added:
+        while _ring_count == 0 or _ring_ts[(_ring_count - 1) % CAMERA_RING_SIZE] <= after_ts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (_capture_thread is None and _capture_task is None):
+                return False
+            _frame_added.wait(remaining)
+        return True
+
+def get_frames(start=None, end=None, transform=None):
+    """Return [(timestamp, frame), ...] oldest first for buffered frames in [start, end].
+
+    Used to pull pre-trigger frames from just before a sensor fired. If
+    `transform` is given it is applied to each buffered frame in place of a
+    full copy (it must return a new array, e.g. a downscaled one).
+    """
+    with _ring_lock:
+        n = min(_ring_count, CAMERA_RING_SIZE)
+        frames = []
+        for i in range(_ring_count - n, _ring_count):
+            slot = i % CAMERA_RING_SIZE
+            ts = _ring_ts[slot]
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                frame = _ring[slot]
+                frames.append((ts, transform(frame) if transform else frame.copy()))
+    return frames
 
 def capture_image(prefix="intruder"):
-    """Capture an image and save it to the logs folder."""
-    global camera
+    """Save the newest frame to the logs folder."""
     ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    filename = f"/home/malware/smart_home_logs/{prefix}_{ts}.jpg"
+    filename = os.path.join(LOG_DIR, f"{prefix}_{ts}.jpg")
 
-    frame = camera.capture_array()
+    frame, _ = latest_frame()
     if frame is not None:
         from PIL import Image
         img = Image.fromarray(frame)
         img.save(filename)
-        log_event(f"Captured image: {filename}")
+        log_event(f"Captured image: {filename}", event_type="image_captured",
+                  source="camera", image=filename)
         return filename
     else:
         log_event("Camera capture failed")
         return None
 
+def get_brightness(max_age=BRIGHTNESS_CACHE_TTL):
+    """Room brightness (0-255), reusing a reading younger than max_age seconds."""
+    global _brightness_cache
+    value, measured = _brightness_cache
+    if value is not None and time.monotonic() - measured < max_age:
+        return value
+    frame, _ = latest_frame()
+    if frame is None:
+        return None
+    value = estimate_brightness(frame, BRIGHTNESS_SAMPLE_STEP)
+    _brightness_cache = (value, time.monotonic())
+    log_event(f"Room brightness: {value:.1f}")
+    return value
+
 def is_dark():
     """Check if the room is dark based on the average brightness."""
-    global camera
-    frame = camera.capture_array()
-    if frame is None:
+    avg_brightness = get_brightness()
+    if avg_brightness is None:
         log_event("Camera frame grab failed")
         return False
-    gray = np.mean(frame, axis=2)  # convert to grayscale by averaging channels
-    avg_brightness = np.mean(gray)
-    log_event(f"Room brightness: {avg_brightness:.1f}")
     return avg_brightness < BRIGHTNESS_THRESHOLD
 
 def get_frame():
-    """Return the current frame as JPEG bytes."""
-    global camera
-    frame = camera.capture_array()
-    if frame is None:
-        log_event("Camera frame grab failed")
-        return None
-    import cv2
-    ret, jpeg = cv2.imencode(".jpg", frame)
-    return jpeg.tobytes() if ret else None
-
+    """Return the current frame as JPEG bytes.
 
-get_frame()
\ No newline at end of file
+    Each captured frame is encoded at most once; repeated calls for the same
+    frame (e.g. several live viewers) get the cached bytes.
+    """
+    global _jpeg_cache
+    with _jpeg_lock:
+        frame, ts = latest_frame()
+        if frame is None:
+            return None
+        if _jpeg_cache[0] == ts:
+            return _jpeg_cache[1]
+        ret, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, LIVE_VIEW_JPEG_QUALITY])
+        if not ret:
+            return None
+        _jpeg_cache = (ts, jpeg.tobytes())
+        return _jpeg_cache[1]
@@ -1,3 +1,5 @@
+import os
+
 # === GSM Config ===
 GSM_SERIAL_PORT = "/dev/serial0"
 GSM_BAUDRATE = 9600   # SIM800L default
@@ -26,7 +28,157 @@ CAMERA_INDEX = 0
 BRIGHTNESS_THRESHOLD = 50
 
 # === Logs ===
-LOG_DIR = "/home/malware/smart_home_logs"
+LOG_DIR = os.environ.get("SMART_HOME_LOG_DIR", "/home/malware/smart_home_logs")
 
 # === SMS recipients ===
 ALERT_PHONE_NUMBERS = ["+233552915020"]
+
+# === Log writer ===
+LOG_QUEUE_SIZE = 2000          # max pending log lines before new ones are dropped
+LOG_FLUSH_INTERVAL = 1.0       # seconds between batched writes
+LOG_BATCH_MAX = 500            # ...or write as soon as this many lines are waiting
+LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate events.log after 5 MB
+LOG_MAX_AGE = 24 * 3600        # ...or after one day
+LOG_BACKUP_COUNT = 10          # gzipped rotations kept in LOG_DIR
+
+# === Structured event store ===
+EVENT_STORE_DIR = LOG_DIR + "/events"
+EVENT_SEGMENT_BYTES = 1024 * 1024   # start a new segment after 1 MB
+EVENT_INDEX_EVERY = 64              # one sparse index entry per N records
+EVENT_MAX_AGE = 90 * 24 * 3600      # delete segments whose events are all older than this
+EVENT_MAX_BYTES = 200 * 1024 * 1024 # and the oldest ones while the store is bigger than this
+
+# === AT command timeouts (seconds) ===
+AT_TIMEOUT = 2          # plain commands answered with OK/ERROR
+SMS_SEND_TIMEOUT = 60   # network confirmation (+CMGS) after Ctrl+Z
+MMS_SEND_TIMEOUT = 120
+
+# === GSM outbound queue ===
+GSM_QUEUE_MAX = 50   # above this, low-priority notices are refused
+
+# === Alert coalescing ===
+# Events of the same kind within the cooldown merge into one summary notification
+ALERT_COALESCE_WINDOW = 30   # default cooldown in seconds
+ALERT_COOLDOWNS = {
+    "intruder_motion": 60,
+    "authorized_motion": 300,
+    "unauthorized_rfid": 30,
+    "rfid_bruteforce": 300,
+    "smoke": 60,
+    "flame": 60,
+}
+
+# === SMS/MMS outbox ===
+OUTBOX_FILE = LOG_DIR + "/outbox.journal"
+OUTBOX_ORDER = "priority"        # "priority" (emergencies first) or "oldest"
+OUTBOX_RETRY_BASE = 5            # seconds; doubles on every failed attempt
+OUTBOX_RETRY_MAX = 600
+OUTBOX_MAX_AGE = 24 * 3600       # give up on messages older than this
+OUTBOX_COMPACT_AFTER = 200       # rewrite the journal after this many finished entries
+
+# === MMS image ===
+MMS_MAX_BYTES = 60 * 1024     # JPEG budget after recompression
+MMS_MAX_DIMENSION = 640       # longest side in pixels
+MMS_CHUNK_BYTES = 3 * 1024    # raw bytes per serial write (multiple of 3 for base64)
+
+# === Camera frame ring ===
+CAMERA_RING_SIZE = 30        # frames kept in memory (3 s at 10 fps)
+CAMERA_CAPTURE_FPS = 10
+BRIGHTNESS_SAMPLE_STEP = 8   # use every 8th pixel in each direction for brightness
+BRIGHTNESS_CACHE_TTL = 5     # seconds an is_dark() reading is reused
+
+# === Live view (MJPEG over HTTP, LAN only) ===
+LIVE_VIEW_ENABLED = os.environ.get("SMART_HOME_LIVE_VIEW") == "1"  # off unless opted in
+LIVE_VIEW_TOKEN_FILE = LOG_DIR + "/live_view_token"  # secret path segment of every URL
+LIVE_VIEW_HOST = "0.0.0.0"
+LIVE_VIEW_PORT = 8080
+LIVE_VIEW_FPS = 5            # max frames/s pushed to viewers
+LIVE_VIEW_CLIENT_CHECK = 2.0  # while no frames arrive, check this often that a viewer is still there
+LIVE_VIEW_JPEG_QUALITY = 75
+
+# === Event clips ===
+CLIP_PREROLL_SECONDS = 3     # taken from the camera ring (bounded by CAMERA_RING_SIZE)
+CLIP_POSTROLL_SECONDS = 10   # keep recording this long after the last trigger
+CLIP_MAX_SECONDS = 60
+
+# === Camera confirmation of PIR motion ===
+MOTION_VERIFY_ENABLED = True
+MOTION_VERIFY_STEP = 8              # downscale factor for the grayscale comparison
+MOTION_VERIFY_PIXEL_DELTA = 25      # per-pixel change (0-255) that counts as "changed"
+MOTION_VERIFY_MIN_CHANGED = 0.02    # fraction of changed pixels needed to confirm
+MOTION_VERIFY_LOOKBACK = 0.5        # seconds of frames before the PIR edge to inspect (the PIR fires once a body is in view)
+MOTION_VERIFY_MAX_WAIT = 2 / CAMERA_CAPTURE_FPS  # longest wait for a frame captured after the edge
+MOTION_VERIFY_BG_ALPHA = 0.1        # background running-average weight per frame
+
+# === Event bus ===
+EVENT_BUS_QUEUE_SIZE = 100   # pending events per handler before new ones are dropped
+
+# === Environment sampling (seconds) ===
+# interval = how often each sensor is read; deadline = max acceptable read time
+FLAME_SAMPLE_INTERVAL = 0.2
+FLAME_SAMPLE_DEADLINE = 0.05
+SMOKE_SAMPLE_INTERVAL = 0.1     # one I2C read per sample in continuous mode
+SMOKE_SAMPLE_DEADLINE = 0.2
+DHT_SAMPLE_INTERVAL = 30
+DHT_SAMPLE_DEADLINE = 10
+ALARM_RESET_SECONDS = 5      # buzzer/light stay on this long after smoke or flame clears
+
+# === Smoke sensor (ADS1115 continuous mode + filtering) ===
+SMOKE_DATA_RATE = 128        # ADS1115 samples/s (8..860)
+SMOKE_MEDIAN_WINDOW = 5      # samples in the spike-rejecting median
+SMOKE_EWMA_ALPHA = 0.2       # smoothing of the median output
+SMOKE_ROR_WINDOW = 5         # seconds over which rate of rise is measured
+SMOKE_ROR_THRESHOLD = 0.03   # V/s rise that raises the alarm early...
+SMOKE_ROR_MIN_MARGIN = 0.1   # ...once the level is this far above baseline
+
+# === Smoke calibration ===
+SMOKE_CALIBRATION_FILE = LOG_DIR + "/smoke_calibration.json"
+SMOKE_CALIBRATION_MAX_AGE = 7 * 24 * 3600   # reuse a saved baseline this long
+SMOKE_THRESHOLD_MARGIN = 0.2                # threshold = baseline + margin
+SMOKE_DEFAULT_THRESHOLD = 1.0               # used until the first calibration completes
+SMOKE_RECALIBRATE_INTERVAL = 3600           # seconds of clean air per background recalibration
+SMOKE_MAX_DRIFT = 0.1                       # V a background recalibration may rise above the full one
+
+# === Sensor time-series storage ===
+TIMESERIES_DIR = LOG_DIR + "/timeseries"
+TS_RAW_CAPACITY = 6 * 3600          # raw points kept per metric (6 h at 1/s)
+TS_MINUTE_CAPACITY = 14 * 24 * 60   # 1-min min/max/mean rows (14 days)
+TS_HOUR_CAPACITY = 2 * 365 * 24     # 1-h min/max/mean rows (2 years)
+TS_SMOKE_RECORD_INTERVAL = 1.0      # seconds between stored smoke points
+
+# === Startup ===
+CAMERA_PREVIEW = False          # open a QTGL preview window (needs a desktop session)
+IMPORT_TIME_BUDGET_MS = 500     # import_budget.py fails above this for `import main`
+STARTUP_TIMEOUT = 30            # seconds to wait for subsystems to come up
+DEVICE_RETRY_INTERVAL = 30      # seconds between attempts to open a missing device
+
+# === Device backends ===
+# "hardware" drives the Pi peripherals; "sim" swaps in sim_devices (any Linux box)
+DEVICE_BACKEND = os.environ.get("SMART_HOME_DEVICES", "hardware")
+
+# === RFID whitelist store ===
+RFID_WHITELIST_FILE = "rfid_whitelist.jsonl"   # append-only journal
+RFID_LEGACY_FILE = "rfid_whitelist.json"       # old flat uid -> name file, imported once
+RFID_WHITELIST_COMPACT_AFTER = 500             # journal ops before rewriting a snapshot
+
+# === RFID reader ===
+RFID_DEBOUNCE_SECONDS = 2.0     # ignore the same card again within this time (held on the reader)
+RFID_REQA_INTERVAL = 0.2        # seconds between card-presence requests while waiting on the IRQ
+RFID_POLL_INTERVAL = 0.1        # fallback polling period when the IRQ line is unavailable
+RFID_REGISTER_TIMEOUT = 30      # seconds the register commands wait for a card
+
+# === Denied RFID scans ===
+RFID_DENIED_WINDOW = 120        # seconds of denied scans counted together
+RFID_ESCALATE_ATTEMPTS = 3      # denied scans in the window that escalate to one brute-force alert
+
+# === Sessions ===
+SESSIONS_FILE = LOG_DIR + "/sessions.json"
+SESSION_DURATION = 8 * 3600     # auto-logout after an RFID entry
+
+# === Runtime ===
+# "threads" gives each subsystem its own threads; "asyncio" runs them as tasks
+# on one event loop (see async_runtime.py)
+RUNTIME = os.environ.get("SMART_HOME_RUNTIME", "threads")
+ASYNC_EXECUTOR_WORKERS = 4      # loop worker pool: bus handlers and modem bookkeeping
+ASYNC_DRIVER_WORKERS = 2        # bounded pool for blocking driver calls (DHT, ADC, camera, card reads)
+LOOP_LAG_INTERVAL = 0.5         # seconds between event-loop lag probes
@@ -0,0 +1,77 @@
+"""
+Deferred hardware initialization.
+
+device(name, factory) returns an accessor that builds the device on its
+first call and hands back the same instance afterwards. Importing a module
+therefore never touches GPIO, I2C, SPI or the camera; the hardware is opened
+by whichever subsystem needs it first, and independent devices can come up
+in parallel (each has its own lock).
+
+A device that fails to open raises DeviceUnavailable; the failure is logged
+once and the open is retried at most every DEVICE_RETRY_INTERVAL seconds,
+so a sensor lane polling a missing device stays cheap and quiet.
+
+use_backend() swaps in other factories by device name before first use;
+sim_devices installs simulated hardware this way.
+"""
+import threading
+import time
+from config import DEVICE_RETRY_INTERVAL
+from utils import log_event
+
+_devices = {}      # name -> instance
+_init_times = {}   # name -> seconds spent in the factory
+_errors = {}       # name -> last init error
+_retry_at = {}     # name -> monotonic time of the next init attempt
+_overrides = {}    # name -> factory used instead of the hardware one
+
+class DeviceUnavailable(Exception):
+    """The device could not be opened (missing hardware or driver)."""
+
+def device(name, factory):
+    """Return a thread-safe, lazily initializing accessor for one device."""
+    lock = threading.Lock()
+
+    def get():
+        if name in _devices:
+            return _devices[name]
+        with lock:
+            if name not in _devices:
+                started = time.monotonic()
+                if started < _retry_at.get(name, 0):
+                    raise DeviceUnavailable(f"{name}: {_errors[name]}")
+                try:
+                    instance = _overrides.get(name, factory)()
+                except Exception as e:
+                    if _errors.get(name) != str(e):  # don't repeat the same failure every retry
+                        log_event(f"Device '{name}' failed to initialize: {e}")
+                    _errors[name] = str(e)
+                    _retry_at[name] = started + DEVICE_RETRY_INTERVAL
+                    raise DeviceUnavailable(f"{name}: {e}") from e
+                _init_times[name] = time.monotonic() - started
+                _errors.pop(name, None)
+                _devices[name] = instance
+                log_event(f"Device '{name}' initialized in {_init_times[name] * 1000:.0f} ms")
+            return _devices[name]
+
+    get.device_name = name
+    return get
+
+def use_backend(factories):
+    """Replace device factories ({name: factory}); only affects devices not yet opened."""
+    _overrides.update(factories)
+
+def is_initialized(name):
+    return name in _devices
+
+def print_device_report():
+    """Print init time (or error) for every device touched so far."""
+    if not _init_times and not _errors:
+        print("No devices initialized yet")
+        return
+    print(f"{'device':<12} {'init ms':>8}  status")
+    for name in sorted(set(_init_times) | set(_errors)):
+        if name in _errors:
+            print(f"{name:<12} {'-':>8}  error: {_errors[name]}")
+        else:
+            print(f"{name:<12} {_init_times[name] * 1000:>8.0f}  ok")
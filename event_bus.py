@@ -0,0 +1,149 @@
+"""
+In-process event bus.
+
+Sensor callbacks call publish(), which only timestamps the event and puts it
+on each subscribed handler's bounded queue, so gpiozero's callback thread
+returns immediately. Each handler has its own small pool of worker threads
+(max_concurrency), which caps how many copies of it run at once and keeps
+one slow handler from starving the others.
+
+Under the asyncio runtime each handler gets an asyncio.Queue and
+max_concurrency consumer tasks instead; handlers themselves run on the
+loop's worker pool, so a blocking handler never stalls the loop.
+"""
+import queue
+import threading
+import time
+from config import EVENT_BUS_QUEUE_SIZE
+from utils import log_event, event_loop, start_task
+
+_lock = threading.Lock()
+_handlers = {}  # event type -> [handler state]
+
+def subscribe(event_type, handler, max_concurrency=1, queue_size=EVENT_BUS_QUEUE_SIZE):
+    """Run handler(event) for every published event of event_type."""
+    loop = event_loop()
+    state = {
+        "name": getattr(handler, "__name__", repr(handler)),
+        "handler": handler,
+        "loop": loop,
+        "queue": queue.Queue(maxsize=queue_size) if loop is None else _async_queue(queue_size),
+        "lock": threading.Lock(),  # guards the counters below, bumped from several threads
+        "processed": 0,
+        "dropped": 0,
+        "errors": 0,
+        "max_depth": 0,
+        "wait_total": 0.0,   # seconds between publish and handler start
+        "run_total": 0.0,
+        "run_max": 0.0,
+    }
+    for i in range(max_concurrency):
+        if loop is not None:
+            start_task(_consume(state))
+        else:
+            threading.Thread(target=_worker, args=(state,), name=f"bus-{state['name']}-{i}",
+                             daemon=True).start()
+    with _lock:
+        _handlers.setdefault(event_type, []).append(state)
+
+def publish(event_type, **data):
+    """Queue an event for its handlers and return at once. Returns the event dict."""
+    event = dict(data, type=event_type, ts=time.time())
+    with _lock:
+        targets = list(_handlers.get(event_type, ()))
+    for state in targets:
+        if state["loop"] is not None:
+            state["loop"].call_soon_threadsafe(_put_async, state, event)
+            continue
+        try:
+            state["queue"].put_nowait(event)
+        except queue.Full:
+            with state["lock"]:
+                state["dropped"] += 1
+            continue
+        _track_depth(state)
+    return event
+
+def _put_async(state, event):
+    """publish() for a loop-side queue; runs on the loop, so full() can't go stale."""
+    if state["queue"].full():
+        with state["lock"]:
+            state["dropped"] += 1
+        return
+    state["queue"].put_nowait(event)
+    _track_depth(state)
+
+def _track_depth(state):
+    depth = state["queue"].qsize()
+    with state["lock"]:
+        if depth > state["max_depth"]:
+            state["max_depth"] = depth
+
+def _worker(state):
+    while True:
+        event = state["queue"].get()
+        started = time.time()
+        _handle(state, event)
+        _record(state, event, started, time.time())
+
+async def _consume(state):
+    loop = state["loop"]
+    while True:
+        event = await state["queue"].get()
+        started = time.time()
+        await loop.run_in_executor(None, _handle, state, event)
+        _record(state, event, started, time.time())
+
+def _handle(state, event):
+    try:
+        state["handler"](event)
+    except Exception as e:
+        with state["lock"]:
+            state["errors"] += 1
+        log_event(f"Event handler {state['name']} failed on {event['type']}: {e}")
+
+def _record(state, event, started, finished):
+    with state["lock"]:
+        state["processed"] += 1
+        state["wait_total"] += started - event["ts"]
+        state["run_total"] += finished - started
+        state["run_max"] = max(state["run_max"], finished - started)
+
+def _async_queue(maxsize):
+    import asyncio
+    return asyncio.Queue(maxsize=maxsize)
+
+def bus_stats():
+    """Per-handler queue depth and latency figures."""
+    stats = []
+    with _lock:
+        items = [(t, s) for t, states in _handlers.items() for s in states]
+    for event_type, state in items:
+        with state["lock"]:
+            s = dict(state)
+        n = s["processed"] or 1
+        stats.append({
+            "event": event_type,
+            "handler": s["name"],
+            "depth": s["queue"].qsize(),
+            "max_depth": s["max_depth"],
+            "processed": s["processed"],
+            "dropped": s["dropped"],
+            "errors": s["errors"],
+            "avg_wait_ms": s["wait_total"] / n * 1000,
+            "avg_run_ms": s["run_total"] / n * 1000,
+            "max_run_ms": s["run_max"] * 1000,
+        })
+    return stats
+
+def print_bus_stats():
+    stats = bus_stats()
+    if not stats:
+        print("No event handlers registered")
+        return
+    print(f"{'event':<18} {'handler':<28} {'depth':>5} {'max':>4} {'done':>6} {'drop':>5} "
+          f"{'err':>4} {'wait ms':>8} {'run ms':>8} {'max ms':>8}")
+    for s in stats:
+        print(f"{s['event']:<18} {s['handler']:<28} {s['depth']:>5} {s['max_depth']:>4} "
+              f"{s['processed']:>6} {s['dropped']:>5} {s['errors']:>4} {s['avg_wait_ms']:>8.1f} "
+              f"{s['avg_run_ms']:>8.1f} {s['max_run_ms']:>8.1f}")
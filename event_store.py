@@ -0,0 +1,228 @@
+"""
+Append-only structured event store.
+
+Records are JSON lines in segment files (events-<start_ms>.seg). Each segment
+has a sparse index (.idx) with one "ts offset" line every EVENT_INDEX_EVERY
+records, so a time-range query bisects the index and seeks straight to the
+first relevant record instead of scanning the file. Segments are
+time-ordered, so a query skips whole segments that end before its start and
+reads the rest one after another.
+
+Whenever a new segment is started, the oldest ones are deleted once they
+are older than EVENT_MAX_AGE or the store exceeds EVENT_MAX_BYTES, so the
+SD card never fills.
+
+Usage:
+    python event_store.py --since 168 --type intruder_alert
+"""
+import os
+import sys
+import json
+import glob
+import bisect
+import itertools
+import argparse
+import time
+from datetime import datetime
+from config import EVENT_STORE_DIR, EVENT_SEGMENT_BYTES, EVENT_INDEX_EVERY, EVENT_MAX_AGE, EVENT_MAX_BYTES
+
+RECORD_FIELDS = ("source", "zone", "uid", "image", "clip")
+
+# Writer state, only touched by the log writer thread
+_seg = None
+_idx = None
+_since_index = 0
+_last_ts = None
+
+def make_record(ts, msg, fields):
+    """Build a record dict from a log message and its structured fields."""
+    unknown = set(fields) - {"event_type", *RECORD_FIELDS}
+    if unknown:
+        raise TypeError(f"log_event() got unexpected field(s): {', '.join(sorted(unknown))}")
+    rec = {"ts": round(ts, 3), "type": fields.get("event_type") or "info", "msg": msg}
+    for key in RECORD_FIELDS:
+        value = fields.get(key)
+        if value is not None:
+            rec[key] = value
+    return rec
+
+def _segments():
+    """[(start_ts, path)] of every segment, oldest first."""
+    paths = sorted(glob.glob(os.path.join(EVENT_STORE_DIR, "events-*.seg")))
+    return [(int(os.path.basename(p)[7:-4]) / 1000, p) for p in paths]
+
+def _prune():
+    """Delete the oldest segments past EVENT_MAX_AGE or over EVENT_MAX_BYTES (never the newest)."""
+    segments = _segments()
+    sizes = []
+    for _, path in segments:
+        try:
+            sizes.append(os.path.getsize(path) + os.path.getsize(path[:-4] + ".idx"))
+        except OSError:
+            sizes.append(0)
+    total = sum(sizes)
+    cutoff = time.time() - EVENT_MAX_AGE
+    for i in range(len(segments) - 1):
+        # A segment ends where the next one starts
+        if segments[i + 1][0] >= cutoff and total <= EVENT_MAX_BYTES:
+            break
+        for path in (segments[i][1], segments[i][1][:-4] + ".idx"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= sizes[i]
+
+def _open_segment(start_ts):
+    global _seg, _idx, _since_index
+    os.makedirs(EVENT_STORE_DIR, exist_ok=True)
+    _prune()
+    base = os.path.join(EVENT_STORE_DIR, f"events-{int(start_ts * 1000):015d}")
+    _seg = open(base + ".seg", "ab")
+    _idx = open(base + ".idx", "a")
+    _since_index = 0
+
+def _resume_segment():
+    """Reopen the newest segment after a restart, if it still has room."""
+    global _last_ts
+    from utils import trim_torn_tail  # utils imports this module
+    segments = _segments()
+    if not segments:
+        return False
+    start_ts, path = segments[-1]
+    # A record torn by a crash would swallow the first one appended after it
+    trim_torn_tail(path)
+    trim_torn_tail(path[:-4] + ".idx")
+    if os.path.getsize(path) >= EVENT_SEGMENT_BYTES:
+        return False
+    _open_segment(start_ts)
+    _last_ts = _tail_ts(path)
+    return True
+
+def _tail_ts(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 4096))
+            lines = f.read().splitlines()
+        return json.loads(lines[-1])["ts"] if lines else None
+    except Exception:
+        return None
+
+def _close_segment():
+    global _seg, _idx
+    if _seg:
+        _seg.close()
+        _idx.close()
+    _seg = _idx = None
+
+def append_records(records):
+    """Append a batch of records. Called from the log writer thread only."""
+    global _since_index, _last_ts
+    if not records:
+        return
+    if _seg is None and not _resume_segment():
+        _open_segment(records[0]["ts"])
+    for rec in records:
+        ts = rec["ts"]
+        # Keep every segment sorted by time: roll on size or if the clock stepped back
+        if _seg.tell() >= EVENT_SEGMENT_BYTES or (_last_ts is not None and ts < _last_ts):
+            _close_segment()
+            _open_segment(ts)
+        if _since_index == 0:
+            _idx.write(f"{ts} {_seg.tell()}\n")
+        _seg.write(json.dumps(rec).encode() + b"\n")
+        _since_index = (_since_index + 1) % EVENT_INDEX_EVERY
+        _last_ts = ts
+    _seg.flush()
+    _idx.flush()
+
+def _load_index(idx_path):
+    times, offsets = [], []
+    try:
+        with open(idx_path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    times.append(float(parts[0]))
+                    offsets.append(int(parts[1]))
+    except OSError:
+        pass
+    return times, offsets
+
+def _line_ts(line):
+    """ts of a stored line without parsing it: every record starts with {"ts": <ts>, ..."""
+    return float(line[7:line.index(b",")])
+
+def _scan_segment(seg_path, start, end, event_type):
+    # Records are dumped as {"ts": .., "type": .., ...}: match the type before parsing
+    needle = None if event_type is None else b'"type": ' + json.dumps(event_type).encode() + b","
+    times, offsets = _load_index(seg_path[:-4] + ".idx")
+    offset = 0
+    if times and start is not None:
+        # Last index entry at or before start; records before it are skipped unread
+        i = bisect.bisect_right(times, start) - 1
+        if i >= 0:
+            offset = offsets[i]
+    try:
+        f = open(seg_path, "rb")
+    except FileNotFoundError:
+        return  # pruned since the query listed it
+    with f:
+        f.seek(offset)
+        for line in f:
+            try:
+                ts = _line_ts(line)
+            except ValueError:
+                continue  # torn write at the tail after a crash
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                break
+            if needle is not None and needle not in line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if event_type is None or rec.get("type") == event_type:
+                yield rec
+
+def query_events(start=None, end=None, event_type=None):
+    """Yield records with start <= ts <= end (epoch seconds), oldest first."""
+    segments = _segments()
+    scans = []
+    for i, (seg_start, path) in enumerate(segments):
+        if end is not None and seg_start > end:
+            break
+        if start is not None and i + 1 < len(segments) and segments[i + 1][0] < start:
+            continue  # ends before the range: neither its index nor its records are read
+        scans.append(_scan_segment(path, start, end, event_type))
+    return itertools.chain.from_iterable(scans)
+
+def format_record(rec):
+    ts = datetime.utcfromtimestamp(rec["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    extras = " ".join(f"{k}={rec[k]}" for k in RECORD_FIELDS if k in rec)
+    return f"{ts} UTC | {rec['type']:<16} | {rec['msg']}" + (f" [{extras}]" if extras else "")
+
+def print_events(hours=24, event_type=None, limit=None):
+    """Print events from the last `hours`, optionally filtered by type."""
+    count = 0
+    for rec in query_events(start=time.time() - hours * 3600, event_type=event_type):
+        print(format_record(rec))
+        count += 1
+        if limit and count >= limit:
+            break
+    if count == 0:
+        print("No matching events")
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the structured event store")
+    parser.add_argument("--since", type=float, default=24, help="hours back from now (default 24)")
+    parser.add_argument("--type", dest="event_type", help="only events of this type")
+    parser.add_argument("--limit", type=int, help="stop after N events")
+    args = parser.parse_args(argv)
+    print_events(args.since, args.event_type, args.limit)
+
+if __name__ == "__main__":
+    sys.exit(main())
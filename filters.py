@@ -0,0 +1,41 @@
+"""
+Streaming filters for noisy analog sensors.
+"""
+import statistics
+from collections import deque
+
+class TrendFilter:
+    """Median (spike rejection) followed by an EWMA, with rate-of-rise over a time window.
+
+    Memory is fixed: the median window and the rate-of-rise history are both
+    bounded ring buffers.
+    """
+
+    def __init__(self, median_window=5, alpha=0.2, ror_window=5.0, max_history=1024):
+        self.alpha = alpha
+        self.ror_window = ror_window
+        self.recent = deque(maxlen=median_window)
+        self.history = deque(maxlen=max_history)  # (t, filtered value)
+        self.value = None
+
+    def update(self, sample, t):
+        """Add a raw sample taken at time t (seconds); returns the filtered value."""
+        self.recent.append(sample)
+        median = statistics.median(self.recent)
+        if self.value is None:
+            self.value = median
+        else:
+            self.value += self.alpha * (median - self.value)
+        self.history.append((t, self.value))
+        while self.history and self.history[0][0] < t - self.ror_window:
+            self.history.popleft()
+        return self.value
+
+    def rate_of_rise(self):
+        """Change of the filtered value per second across the window (0 until half full)."""
+        if len(self.history) < 2:
+            return 0.0
+        (t0, v0), (t1, v1) = self.history[0], self.history[-1]
+        if t1 - t0 < self.ror_window / 2:
+            return 0.0
+        return (v1 - v0) / (t1 - t0)
@@ -1,107 +1,578 @@
+import io
+import os
 import serial
 import time
 import base64
-from config import ALERT_PHONE_NUMBERS, GSM_BAUDRATE, GSM_SERIAL_PORT
-from utils import log_event
+import threading
+from concurrent.futures import Future
+from config import (ALERT_PHONE_NUMBERS, GSM_BAUDRATE, GSM_SERIAL_PORT,
+                    AT_TIMEOUT, SMS_SEND_TIMEOUT, MMS_SEND_TIMEOUT, GSM_QUEUE_MAX,
+                    MMS_MAX_BYTES, MMS_MAX_DIMENSION, MMS_CHUNK_BYTES,
+                    OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX, OUTBOX_MAX_AGE)
+from utils import log_event, event_loop, start_task, run_blocking
+from devices import device
+import outbox
 
+# Only the modem worker (thread or task) touches gsm_serial
 gsm_serial = None
+_port = None  # non-blocking view of gsm_serial while the modem task owns it (asyncio runtime)
 
-def open_gsm():
-    global gsm_serial
+# === Outbound priorities (lower goes first) ===
+PRIORITY_EMERGENCY = 0   # smoke, flame
+PRIORITY_ALERT = 1       # intruder, unauthorized RFID
+PRIORITY_NOTICE = 2      # entry/exit, room activity
+
+_modem_runner = None  # worker thread, or the task's Future under asyncio
+_modem_runner_lock = threading.Lock()
+_futures = {}  # outbox id -> Future, for messages queued by this process
+_futures_lock = threading.Lock()
+_open_failures = 0  # consecutive failed open_gsm() attempts
+
+CTRL_Z = bytes([26])
+
+# Final result codes that end a command unsuccessfully
+AT_ERRORS = ("ERROR", "+CMS ERROR", "+CME ERROR", "NO CARRIER")
+
+class GSMPermanentError(Exception):
+    """A message that can never be sent (e.g. its image is gone); not retried."""
+
+# Serial device the modem is on (a pty for the simulated SIM800L)
+get_modem_port = device("modem", lambda: GSM_SERIAL_PORT)
+
+def _open_port(port, baudrate, timeout):
+    return serial.Serial(port or get_modem_port(), baudrate, timeout=timeout)
+
+def _opened(ser, answered):
+    """Adopt a port whose handshake has run. Returns True if the modem answered."""
+    global gsm_serial, _open_failures
+    if not answered:
+        log_event("GSM open error: modem not responding")
+        return False
+    gsm_serial = ser
+    log_event("GSM opened")
+    if _open_failures > 1:
+        # Modem is back after an outage: drain everything that was held back
+        outbox.reschedule_all(0)
+    _open_failures = 0
+    return True
+
+def open_gsm(port=None, baudrate=GSM_BAUDRATE):
+    global gsm_serial, _open_failures
     if gsm_serial and gsm_serial.is_open:
         return gsm_serial
+    _open_failures += 1
     try:
-        gsm_serial = serial.Serial(GSM_SERIAL_PORT, GSM_BAUDRATE, timeout=1)
-        time.sleep(0.5)
-        log_event("GSM opened")
+        # Short read timeout: at_command does its own per-command deadline
+        ser = _open_port(port, baudrate, 0.1)
+        if not _opened(ser, _run_dialogue(_handshake(), ser)):
+            ser.close()
+            return None
         return gsm_serial
     except Exception as e:
         log_event(f"GSM open error: {e}")
         gsm_serial = None
         return None
 
-def send_sms(text, recipients=ALERT_PHONE_NUMBERS):
-    """Send SMS to specified recipients"""
-    ser = open_gsm()
-    if not ser:
-        log_event("SMS not sent, GSM unavailable")
+def close_gsm():
+    """Drop the port so the next attempt reopens it (after a brownout or I/O error)."""
+    global gsm_serial, _port
+    if _port is not None:
+        _port.detach()
+        _port = None
+    if gsm_serial:
+        try:
+            gsm_serial.close()
+        except Exception:
+            pass
+    gsm_serial = None
+
+def _parse_response(buf, lines, expect):
+    """Move complete lines from buf to lines until a result code.
+
+    Prompts such as ">" arrive without a line ending and are matched on the
+    partial buffer. Returns (ok, rest): ok is True/False once the command has
+    ended, None while more output is needed.
+    """
+    while b"\n" in buf:
+        raw, buf = buf.split(b"\n", 1)
+        line = raw.strip().decode(errors="replace")
+        if not line:
+            continue
+        lines.append(line)
+        if line.startswith(expect):
+            return True, buf
+        if line.startswith(AT_ERRORS):
+            return False, buf
+    pending = buf.strip().decode(errors="replace")
+    if pending and pending in expect:
+        lines.append(pending)
+        return True, b""
+    return None, buf
+
+def read_response(ser, expect=("OK",), timeout=AT_TIMEOUT):
+    """Read modem output until a line starting with one of `expect` or an error.
+
+    Returns (ok, lines).
+    """
+    deadline = time.monotonic() + timeout
+    buf = b""
+    lines = []
+    while time.monotonic() < deadline:
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            continue
+        ok, buf = _parse_response(buf + chunk, lines, expect)
+        if ok is not None:
+            return ok, lines
+    lines.append("TIMEOUT")
+    return False, lines
+
+def at_command(ser, cmd, expect=("OK",), timeout=AT_TIMEOUT):
+    """Send one AT command and wait for its result code. Returns (ok, lines)."""
+    ser.reset_input_buffer()  # drop stale replies / unsolicited codes
+    ser.write(cmd.encode() + b"\r")
+    return read_response(ser, expect, timeout)
+
+# === Non-blocking modem I/O (asyncio runtime) ===
+class _AsyncPort:
+    """gsm_serial opened with timeout=0; the loop reads it when it becomes readable."""
+
+    def __init__(self, ser):
+        import asyncio
+        self.ser = ser
+        self.buf = b""
+        self.error = None
+        self.data = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(ser.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self.buf += self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:
+            self.error = e  # port gone (brownout, unplugged): stop watching it
+            self.detach()
+        self.data.set()
+
+    def detach(self):
+        if self.ser.is_open:
+            self.loop.remove_reader(self.ser.fileno())
+
+async def _read_response_async(port, expect=("OK",), timeout=AT_TIMEOUT):
+    """read_response() without blocking the loop. Returns (ok, lines)."""
+    import asyncio
+    deadline = time.monotonic() + timeout
+    lines = []
+    while True:
+        if port.error is not None:
+            raise port.error
+        ok, port.buf = _parse_response(port.buf, lines, expect)
+        if ok is not None:
+            return ok, lines
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            lines.append("TIMEOUT")
+            return False, lines
+        port.data.clear()
+        try:
+            await asyncio.wait_for(port.data.wait(), remaining)
+        except asyncio.TimeoutError:
+            pass
+
+async def _at_command_async(port, cmd, expect=("OK",), timeout=AT_TIMEOUT):
+    port.ser.reset_input_buffer()
+    port.buf = b""
+    port.ser.write(cmd.encode() + b"\r")
+    return await _read_response_async(port, expect, timeout)
+
+async def _open_gsm_async(baudrate=GSM_BAUDRATE):
+    """open_gsm() for the modem task. Returns the _AsyncPort or None."""
+    global _port, _open_failures
+    if _port is not None and gsm_serial is not None and gsm_serial.is_open:
+        return _port
+    close_gsm()
+    _open_failures += 1
+    try:
+        ser = await run_blocking(_open_port, None, baudrate, 0)  # timeout=0: reads never block
+        port = _AsyncPort(ser)
+        if not _opened(ser, await _run_dialogue_async(_handshake(), port)):
+            port.detach()
+            ser.close()
+            return None
+        _port = port
+        return _port
+    except Exception as e:
+        log_event(f"GSM open error: {e}")
+        close_gsm()
+        return None
+
+# === AT dialogues ===
+# The modem conversations are generators that yield I/O operations and get
+# each result sent back, so the same dialogue runs on the blocking port
+# (worker thread) or on the non-blocking one (modem task):
+#   ("open",)                      -> port, or None if the modem is unavailable
+#   ("close",)                     -> None; drop the port
+#   ("at", cmd, expect, timeout)   -> (ok, lines)
+#   ("read", expect, timeout)      -> (ok, lines)
+#   ("write", data)                -> None
+#   ("stream", payload_path)       -> bytes written
+#   ("call", func, *args)          -> func(*args), a blocking helper
+# An operation that raises is thrown into the dialogue at its yield.
+
+def _run_dialogue(dialogue, ser=None):
+    """Drive a dialogue on the blocking port. Returns the dialogue's result."""
+    send, value = dialogue.send, None
+    while True:
+        try:
+            op, *args = send(value)
+        except StopIteration as stop:
+            return stop.value
+        send = dialogue.send
+        try:
+            if op == "open":
+                value = ser = open_gsm()
+            elif op == "close":
+                close_gsm()
+                value = ser = None
+            elif op == "at":
+                value = at_command(ser, *args)
+            elif op == "read":
+                value = read_response(ser, *args)
+            elif op == "write":
+                ser.write(*args)
+                value = None
+            elif op == "stream":
+                value = stream_payload(ser, *args)
+            elif op == "call":
+                value = args[0](*args[1:])
+        except Exception as e:
+            send, value = dialogue.throw, e
+
+async def _run_dialogue_async(dialogue, port=None):
+    """Drive a dialogue on the non-blocking port. Returns the dialogue's result."""
+    send, value = dialogue.send, None
+    while True:
+        try:
+            op, *args = send(value)
+        except StopIteration as stop:
+            return stop.value
+        send = dialogue.send
+        try:
+            if op == "open":
+                value = port = await _open_gsm_async()
+            elif op == "close":
+                close_gsm()
+                value = port = None
+            elif op == "at":
+                value = await _at_command_async(port, *args)
+            elif op == "read":
+                value = await _read_response_async(port, *args)
+            elif op == "write":
+                port.ser.write(*args)
+                value = None
+            elif op == "stream":
+                value = await run_blocking(stream_payload, port.ser, *args)
+            elif op == "call":
+                value = await run_blocking(*args)
+        except Exception as e:
+            send, value = dialogue.throw, e
+
+def _handshake():
+    """Wait for the modem to answer instead of sleeping a fixed time. Returns True if it did."""
+    for _ in range(5):
+        ok, _lines = yield ("at", "AT", ("OK",), 0.5)
+        if ok:
+            break
+    else:
         return False
-    
-    success_count = 0
+    yield ("at", "ATE0", ("OK",), AT_TIMEOUT)  # no echo, so replies are just result codes
+    return True
+
+# === Delivery worker ===
+def _start_modem_worker():
+    global _modem_runner
+    with _modem_runner_lock:
+        if _modem_runner is None:
+            if event_loop() is not None:
+                _modem_runner = start_task(_modem_task())
+                return
+            _modem_runner = threading.Thread(target=_modem_worker, name="gsm-modem", daemon=True)
+            _modem_runner.start()
+
+def _modem_worker():
+    """Own the serial port and deliver outbox messages one at a time, with backoff."""
+    while True:
+        entry = outbox.take()
+        if _expire(entry):
+            continue
+        try:
+            failed = _run_dialogue(_JOBS[entry["kind"]](**entry["payload"]))
+        except Exception as e:
+            failed = _job_error(entry, e)
+        _after_attempt(entry, failed)
+
+async def _modem_task():
+    """_modem_worker() as a task: AT I/O on the loop, bookkeeping on the worker pool."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    outbox.add_listener(lambda: loop.call_soon_threadsafe(wake.set))
+    while True:
+        wake.clear()
+        entry, wait = await loop.run_in_executor(None, _poll_live)
+        if entry is None:
+            try:
+                await asyncio.wait_for(wake.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            failed = await _run_dialogue_async(_JOBS[entry["kind"]](**entry["payload"]))
+        except Exception as e:
+            failed = _job_error(entry, e)
+        await loop.run_in_executor(None, _after_attempt, entry, failed)  # fsync'd journal
+
+def _poll_live():
+    """outbox.poll(), finishing any due message that expired while it was held."""
+    while True:
+        entry, wait = outbox.poll()
+        if entry is None or not _expire(entry):
+            return entry, wait
+
+def _expire(entry):
+    """Give up on a message older than OUTBOX_MAX_AGE. Returns True if it was."""
+    if time.time() - entry["created"] <= OUTBOX_MAX_AGE:
+        return False
+    log_event(f"GSM {entry['kind']} #{entry['id']} expired after {entry['attempts']} attempts")
+    _finish(entry, False)
+    return True
+
+def _job_error(entry, error):
+    """Recipients to retry after a dialogue raised, or None to drop the message."""
+    if isinstance(error, GSMPermanentError):
+        log_event(f"GSM {entry['kind']} #{entry['id']} dropped: {error}")
+        return None
+    log_event(f"GSM job error: {error}")
+    close_gsm()
+    return entry["payload"]["recipients"]
+
+def _after_attempt(entry, failed):
+    """Finish, drop or reschedule a message after one delivery attempt."""
+    payload = entry["payload"]
+    if failed is None:
+        _finish(entry, False)
+    elif not failed:
+        _finish(entry, True)
+    elif gsm_serial is None and _open_failures:
+        # Modem unavailable: back off the whole outbox, not just this message
+        delay = min(OUTBOX_RETRY_BASE * 2 ** (_open_failures - 1), OUTBOX_RETRY_MAX)
+        log_event(f"GSM unavailable, retrying in {delay}s ({outbox.pending_count()} message(s) held)")
+        outbox.retry(entry["id"], dict(payload, recipients=failed), delay)
+        outbox.reschedule_all(time.time() + delay)
+    elif time.time() - entry["created"] > OUTBOX_MAX_AGE:
+        log_event(f"GSM {entry['kind']} #{entry['id']} expired after {entry['attempts'] + 1} attempts")
+        _finish(entry, False)
+    else:
+        delay = min(OUTBOX_RETRY_BASE * 2 ** entry["attempts"], OUTBOX_RETRY_MAX)
+        log_event(f"GSM {entry['kind']} #{entry['id']} retry in {delay}s ({len(failed)} recipient(s) left)")
+        outbox.retry(entry["id"], dict(payload, recipients=failed), delay)
+
+def _finish(entry, delivered):
+    outbox.finish(entry["id"], delivered)
+    if entry["kind"] == "mms":
+        _remove_mms_payload(entry["payload"]["image_path"])
+    with _futures_lock:
+        future = _futures.pop(entry["id"], None)
+    if future:
+        future.set_result(delivered)
+
+def queue_message(kind, payload, priority=PRIORITY_ALERT):
+    """Persist a message in the outbox and return a Future resolving to True once delivered."""
+    future = Future()
+    future.set_running_or_notify_cancel()
+    if priority >= PRIORITY_NOTICE and outbox.pending_count() >= GSM_QUEUE_MAX:
+        log_event(f"GSM queue full ({outbox.pending_count()}), dropping notice")
+        future.set_result(False)
+        return future
+    with _futures_lock:
+        entry_id = outbox.add(kind, payload, priority)
+        _futures[entry_id] = future
+    _start_modem_worker()
+    return future
+
+def start_gsm_worker():
+    """Start delivering messages left in the outbox by a previous run."""
+    if outbox.pending_count():
+        _start_modem_worker()
+
+def send_sms(text, recipients=ALERT_PHONE_NUMBERS, priority=PRIORITY_ALERT):
+    """Queue an SMS to recipients. Returns a Future resolving to True once delivered."""
+    return queue_message("sms", {"text": text, "recipients": list(recipients)}, priority)
+
+def send_image_mms(image_path, message="Security Alert", recipients=ALERT_PHONE_NUMBERS,
+                   priority=PRIORITY_ALERT):
+    """Queue an MMS with an image. Returns a Future resolving to True once delivered."""
+    payload = {"image_path": image_path, "message": message, "recipients": list(recipients)}
+    return queue_message("mms", payload, priority)
+
+def _send_sms(text, recipients):
+    """SMS dialogue (modem worker only). Returns the recipients that failed."""
+    if not (yield ("open",)):
+        log_event("SMS not sent, GSM unavailable")
+        return recipients
+
+    ok, lines = yield ("at", "AT+CMGF=1", ("OK",), AT_TIMEOUT)
+    if not ok:
+        log_event(f"SMS error: text mode rejected ({lines[-1]})")
+        yield ("close",)
+        return recipients
+
+    failed = []
     for number in recipients:
         try:
-            ser.write(b'AT\r')
-            time.sleep(0.5)
-            ser.write(b'AT+CMGF=1\r')
-            time.sleep(0.5)
-            cmd = f'AT+CMGS="{number}"\r'.encode()
-            ser.write(cmd)
-            time.sleep(0.5)
-            ser.write(text.encode() + b"\r")
-            time.sleep(0.5)
-            ser.write(bytes([26]))  # Ctrl+Z to send
-            time.sleep(3)
-            log_event(f"SMS sent to {number}")
-            success_count += 1
+            ok, lines = yield ("at", f'AT+CMGS="{number}"', (">",), AT_TIMEOUT)
+            if not ok:
+                yield ("write", b"\x1b")  # ESC aborts a half-open message
+                log_event(f"SMS error {number}: no prompt ({lines[-1]})")
+                failed.append(number)
+                continue
+            yield ("write", text.encode() + CTRL_Z)
+            # Read through the final OK so it isn't taken as the next command's reply
+            ok, lines = yield ("read", ("OK",), SMS_SEND_TIMEOUT)
+            if ok and any(line.startswith("+CMGS:") for line in lines):
+                log_event(f"SMS sent to {number}", event_type="sms_sent", source="gsm")
+            else:
+                log_event(f"SMS error {number}: {lines[-1]}")
+                failed.append(number)
         except Exception as e:
             log_event(f"SMS error {number}: {e}")
-    
-    return success_count > 0
+            failed.append(number)
+
+    return failed
+
+def _send_image_mms(image_path, message, recipients):
+    """MMS dialogue, if supported by GSM module (modem worker only).
+
+    Returns the recipients that failed.
+    """
+    if not image_path or not os.path.exists(image_path):
+        raise GSMPermanentError(f"image missing: {image_path}")
 
-def send_image_mms(image_path, message="Security Alert", recipients=ALERT_PHONE_NUMBERS):
-    """Send image via MMS (if supported by GSM module)"""
-    ser = open_gsm()
-    if not ser:
-        log_event("MMS not sent, GSM unavailable")
-        return False
-    
     try:
-        # Read and encode image
-        with open(image_path, 'rb') as img_file:
-            img_data = base64.b64encode(img_file.read()).decode('utf-8')
-        
-        success_count = 0
-        for number in recipients:
-            try:
-                # Basic MMS AT commands (varies by GSM module)
-                ser.write(b'AT+CMGF=1\r')
-                time.sleep(0.5)
-                
-                # Set MMS parameters
-                ser.write(b'AT+CMMSCURL="http://mms.provider.com"\r')
-                time.sleep(0.5)
-                
-                # Create MMS
-                cmd = f'AT+CMMSSEND="{number}","{message}","image/jpeg"\r'.encode()
-                ser.write(cmd)
-                time.sleep(1)
-                
-                # Send image data (simplified - actual implementation varies)
-                ser.write(img_data[:1000].encode())  # Send first 1KB as example
-                ser.write(bytes([26]))  # Ctrl+Z
-                time.sleep(5)
-                
-                log_event(f"MMS sent to {number}")
-                success_count += 1
-                
-            except Exception as e:
-                log_event(f"MMS error {number}: {e}")
-                
-        return success_count > 0
-        
+        # Recompress and encode once; every recipient streams the same payload file
+        payload_path = yield ("call", prepare_mms_payload, image_path)
     except Exception as e:
-        log_event(f"MMS preparation error: {e}")
-        return False
+        raise GSMPermanentError(f"MMS preparation error: {e}")
+
+    if not (yield ("open",)):
+        log_event("MMS not sent, GSM unavailable")
+        return recipients
+
+    failed = []
+    for number in recipients:
+        try:
+            # Basic MMS AT commands (varies by GSM module)
+            for cmd in ('AT+CMGF=1', 'AT+CMMSCURL="http://mms.provider.com"'):
+                ok, lines = yield ("at", cmd, ("OK",), AT_TIMEOUT)
+                if not ok:
+                    raise RuntimeError(f"{cmd} -> {lines[-1]}")
+
+            # Create MMS, wait for the data prompt
+            cmd = f'AT+CMMSSEND="{number}","{message}","image/jpeg"'
+            ok, lines = yield ("at", cmd, (">", "CONNECT"), AT_TIMEOUT)
+            if not ok:
+                raise RuntimeError(f"no data prompt ({lines[-1]})")
+
+            # Stream the base64 image data in bounded chunks
+            yield ("stream", payload_path)
+            yield ("write", CTRL_Z)
+            ok, lines = yield ("read", ("OK",), MMS_SEND_TIMEOUT)
+            if not ok:
+                raise RuntimeError(lines[-1])
+
+            log_event(f"MMS sent to {number}", event_type="mms_sent", source="gsm", image=image_path)
+
+        except Exception as e:
+            log_event(f"MMS error {number}: {e}")
+            failed.append(number)
+
+    return failed
+
+def _mms_payload_path(image_path):
+    return os.path.splitext(image_path)[0] + ".mms.b64"
+
+def _remove_mms_payload(image_path):
+    """Delete the encoded sidecar once its message is finished (sent, dropped or expired)."""
+    if not image_path:
+        return
+    try:
+        os.remove(_mms_payload_path(image_path))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log_event(f"Could not remove MMS payload for {image_path}: {e}")
+
+def prepare_mms_payload(image_path, max_bytes=MMS_MAX_BYTES, max_dim=MMS_MAX_DIMENSION):
+    """Downscale/recompress an image to fit max_bytes and base64-encode it to a sidecar file.
+
+    Returns the path of the .mms.b64 payload. An existing payload that is newer
+    than the image is reused, so retries don't re-encode.
+    """
+    payload_path = _mms_payload_path(image_path)
+    if os.path.exists(payload_path) and os.path.getmtime(payload_path) >= os.path.getmtime(image_path):
+        return payload_path
+
+    from PIL import Image
+    img = Image.open(image_path)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((max_dim, max_dim))
+
+    jpeg = io.BytesIO()
+    while True:
+        for quality in (85, 70, 55, 40, 25):
+            jpeg.seek(0)
+            jpeg.truncate()
+            img.save(jpeg, "JPEG", quality=quality, optimize=True)
+            if jpeg.tell() <= max_bytes:
+                break
+        if jpeg.tell() <= max_bytes or min(img.size) <= 80:
+            break
+        img = img.resize((img.width // 2, img.height // 2))
+
+    # Encode chunk by chunk (multiples of 3 bytes concatenate into valid base64)
+    jpeg.seek(0)
+    tmp = payload_path + ".tmp"
+    with open(tmp, "wb") as out:
+        while True:
+            chunk = jpeg.read(MMS_CHUNK_BYTES)
+            if not chunk:
+                break
+            out.write(base64.b64encode(chunk))
+    os.replace(tmp, payload_path)
+    log_event(f"MMS payload {payload_path}: {img.width}x{img.height}, {jpeg.tell()} bytes JPEG")
+    return payload_path
+
+def stream_payload(ser, payload_path, chunk_size=MMS_CHUNK_BYTES * 4 // 3):
+    """Write a payload file to the modem in fixed-size chunks. Returns bytes written."""
+    written = 0
+    with open(payload_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            ser.write(chunk)
+            written += len(chunk)
+    return written
+
+_JOBS = {"sms": _send_sms, "mms": _send_image_mms}
 
 def send_live_feed_notification(recipients=ALERT_PHONE_NUMBERS):
-    """Send notification about live camera feed availability"""
-    from camera_module import capture_image
-    
-    # Capture current image
-    image_path = capture_image("live_feed")
-    if image_path:
-        message = f"Live camera feed at {time.strftime('%Y-%m-%d %H:%M:%S')}"
-        send_image_mms(image_path, message, recipients)
-        send_sms(f"Live camera feed updated: {message}", recipients)
-    else:
-        send_sms("Live camera feed requested but capture failed", recipients)
\ No newline at end of file
+    """Send the LAN live view link by SMS (replaces pushing snapshots over MMS)"""
+    from live_view import start_live_view, live_view_url
+
+    if start_live_view() is None:
+        log_event("Live view is disabled (set SMART_HOME_LIVE_VIEW=1), no link sent")
+        return
+    send_sms(f"Live camera feed: {live_view_url()} (LAN only, "
+             f"{time.strftime('%Y-%m-%d %H:%M:%S')})", recipients, priority=PRIORITY_NOTICE)
@@ -0,0 +1,66 @@
+"""
+Import-time budget report.
+
+Imports a module in a fresh interpreter with `python -X importtime` and
+prints the slowest imports, grouped by top-level package, with this repo's
+own modules marked. Exits non-zero if the total is over
+IMPORT_TIME_BUDGET_MS, so it can gate changes that put work back at import.
+
+    python import_budget.py            # import main
+    python import_budget.py sensors 20 # module, rows to show
+"""
+import os
+import sys
+import subprocess
+from collections import defaultdict
+from config import IMPORT_TIME_BUDGET_MS
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure(module):
+    """Return ({package: self_us}, total_us, error) for importing `module`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=REPO_DIR, capture_output=True, text=True)
+    per_package = defaultdict(int)
+    total = 0
+    error = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header row
+        self_us, cumulative_us = int(fields[0]), int(fields[1])
+        name = fields[2].strip()
+        per_package[name.split(".")[0]] += self_us
+        if name == module:
+            total = cumulative_us
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+    return per_package, total, error
+
+def is_repo_module(name):
+    return os.path.exists(os.path.join(REPO_DIR, name + ".py"))
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    module = argv[0] if argv else "main"
+    rows = int(argv[1]) if len(argv) > 1 else 15
+    per_package, total, error = measure(module)
+    if error:
+        print(f"import {module} failed: {error}")
+        return 2
+    print(f"{'package':<24} {'self ms':>8}")
+    for name, us in sorted(per_package.items(), key=lambda item: -item[1])[:rows]:
+        marker = "  *" if is_repo_module(name) else ""
+        print(f"{name:<24} {us / 1000:>8.1f}{marker}")
+    own = sum(us for name, us in per_package.items() if is_repo_module(name))
+    print(f"\nimport {module}: {total / 1000:.1f} ms total, {own / 1000:.1f} ms in this repo (*), "
+          f"budget {IMPORT_TIME_BUDGET_MS} ms")
+    if total / 1000 > IMPORT_TIME_BUDGET_MS:
+        print("OVER BUDGET")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
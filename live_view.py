@@ -0,0 +1,170 @@
+"""
+MJPEG-over-HTTP live view for the LAN.
+
+One broadcaster thread grabs the newest JPEG from camera_module.get_frame()
+at most LIVE_VIEW_FPS times a second, only while someone is watching. Every
+viewer is sent the same bytes; a viewer that can't keep up simply skips to
+the newest frame instead of queueing old ones, so encode cost stays flat as
+viewers are added.
+
+    http://<pi>:8080/<token>/             viewer page
+    http://<pi>:8080/<token>/stream.mjpg  raw MJPEG stream
+    http://<pi>:8080/<token>/snapshot.jpg single frame
+
+The camera is never served unless LIVE_VIEW_ENABLED is set. Every path
+carries a random token, kept in LIVE_VIEW_TOKEN_FILE so links sent by SMS
+stay valid across restarts; anything else gets a 404.
+"""
+import os
+import hmac
+import select
+import socket
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import (LIVE_VIEW_ENABLED, LIVE_VIEW_HOST, LIVE_VIEW_PORT, LIVE_VIEW_FPS, LIVE_VIEW_TOKEN_FILE,
+                    LIVE_VIEW_CLIENT_CHECK)
+from camera_module import get_frame
+from utils import log_event
+
+BOUNDARY = "frame"
+
+PAGE = b"""<html><head><title>Smart Home Live View</title></head>
+<body style="margin:0;background:#000"><img src="stream.mjpg" style="width:100%"></body></html>"""
+
+_cond = threading.Condition()
+_frame = None      # latest JPEG bytes
+_frame_seq = 0     # bumped for every new frame
+_viewers = 0
+_server = None
+_token = None
+
+def _load_token():
+    """The URL token: read from LIVE_VIEW_TOKEN_FILE, or created there (mode 0600)."""
+    try:
+        with open(LIVE_VIEW_TOKEN_FILE) as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except OSError:
+        pass
+    token = secrets.token_urlsafe(16)
+    fd = os.open(LIVE_VIEW_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token + "\n")
+    return token
+
+def _broadcast_loop():
+    global _frame, _frame_seq
+    period = 1.0 / LIVE_VIEW_FPS
+    while True:
+        with _cond:
+            while _viewers == 0:
+                _cond.wait()
+        started = time.monotonic()
+        jpeg = get_frame()
+        if jpeg is not None and jpeg is not _frame:
+            with _cond:
+                _frame = jpeg
+                _frame_seq += 1
+                _cond.notify_all()
+        time.sleep(max(0.0, period - (time.monotonic() - started)))
+
+def _client_gone(sock):
+    """True once the viewer has closed its end (readable, but nothing to read)."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and not sock.recv(1, socket.MSG_PEEK)
+    except OSError:
+        return True
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        _, token, path = (self.path.split("/", 2) + ["", ""])[:3]
+        if not hmac.compare_digest(token.encode(), _token.encode()):
+            self.send_error(404)
+        elif path == "" and not self.path.endswith("/"):
+            self.send_response(301)
+            self.send_header("Location", self.path + "/")
+            self.end_headers()
+        elif path == "":
+            self._send_bytes("text/html", PAGE)
+        elif path == "snapshot.jpg":
+            jpeg = get_frame()
+            if jpeg is None:
+                self.send_error(503, "No frame available")
+            else:
+                self._send_bytes("image/jpeg", jpeg)
+        elif path == "stream.mjpg":
+            self._stream()
+        else:
+            self.send_error(404)
+
+    def _send_bytes(self, content_type, body):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        global _viewers
+        self.send_response(200)
+        self.send_header("Cache-Control", "no-cache, private")
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.end_headers()
+        with _cond:
+            _viewers += 1
+            _cond.notify_all()
+        log_event(f"Live view client connected: {self.client_address[0]} ({_viewers} watching)")
+        seen = -1
+        try:
+            while True:
+                with _cond:
+                    # Always jump to the newest frame; anything older is dropped.
+                    # Writes are what notice a dead client, so while frames stall
+                    # (camera gone, server stopped) check on it between waits.
+                    while _frame is None or _frame_seq == seen:
+                        if (not _cond.wait(LIVE_VIEW_CLIENT_CHECK)
+                                and (_server is None or _client_gone(self.connection))):
+                            return
+                    jpeg, seen = _frame, _frame_seq
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with _cond:
+                _viewers -= 1
+            log_event(f"Live view client disconnected: {self.client_address[0]}")
+
+    def log_message(self, format, *args):
+        pass  # keep per-request noise out of events.log
+
+def start_live_view(host=LIVE_VIEW_HOST, port=LIVE_VIEW_PORT):
+    """Start the HTTP server and broadcaster threads. Returns None if the live view is disabled."""
+    global _server, _token
+    if _server is not None:
+        return _server
+    if not LIVE_VIEW_ENABLED:
+        return None
+    _token = _load_token()
+    _server = ThreadingHTTPServer((host, port), _Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="live-view-http", daemon=True).start()
+    threading.Thread(target=_broadcast_loop, name="live-view-broadcast", daemon=True).start()
+    log_event(f"Live view at {live_view_url()}")
+    return _server
+
+def live_view_url():
+    """Best-effort LAN URL of the viewer page."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))  # no packet is sent; picks the LAN interface
+            ip = s.getsockname()[0]
+    except OSError:
+        ip = socket.gethostname()
+    return f"http://{ip}:{LIVE_VIEW_PORT}/{_token or _load_token()}/"
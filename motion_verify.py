@@ -0,0 +1,79 @@
+"""
+Camera confirmation for PIR triggers.
+
+A running-average background is kept on downscaled grayscale frames from
+the camera ring buffer. When a PIR fires, the frames already buffered around
+the edge (plus the first one captured after it, at most two frame periods
+away) are compared against it; the alert escalates only if enough pixels
+changed.
+Every verdict is logged with its numbers so the thresholds can be tuned.
+"""
+import time
+import threading
+from config import (MOTION_VERIFY_STEP, MOTION_VERIFY_PIXEL_DELTA, MOTION_VERIFY_MIN_CHANGED,
+                    MOTION_VERIFY_LOOKBACK, MOTION_VERIFY_MAX_WAIT, MOTION_VERIFY_BG_ALPHA)
+from camera_module import get_frames, wait_for_frame
+from vision import small_gray, changed_fraction
+from utils import log_event
+
+_lock = threading.Lock()
+_background = None
+_background_ts = 0.0  # timestamp of the newest frame folded into the background
+
+def _small(frame):
+    return small_gray(frame, MOTION_VERIFY_STEP)
+
+def _update_background(frames):
+    """Fold frames newer than the current background into the running average."""
+    global _background, _background_ts
+    for ts, gray in frames:
+        if ts <= _background_ts:
+            continue
+        if _background is None or _background.shape != gray.shape:
+            _background = gray
+        else:
+            _background += MOTION_VERIFY_BG_ALPHA * (gray - _background)
+        _background_ts = ts
+
+def _recent_frames(since):
+    """Fold frames older than `since` into the background; return the newer ones. Caller holds _lock."""
+    # Downscale inside the ring lock instead of copying full frames
+    frames = get_frames(start=_background_ts, transform=_small)
+    _update_background([f for f in frames if f[0] < since])
+    return [f for f in frames if f[0] >= since]
+
+def _changed(recent):
+    """Largest fraction of changed pixels among `recent`, or None without a background."""
+    if _background is None or not recent:
+        return None
+    return max(changed_fraction(gray, _background, MOTION_VERIFY_PIXEL_DELTA) for _, gray in recent)
+
+def verify_motion(trigger_ts, zone=None):
+    """Return True if camera frames around trigger_ts show real movement.
+
+    Fails open (returns True) when there are no frames to judge by.
+    """
+    started = time.perf_counter()
+    since = trigger_ts - MOTION_VERIFY_LOOKBACK
+    with _lock:
+        recent = _recent_frames(since)
+        changed = _changed(recent)
+        if changed is None or changed < MOTION_VERIFY_MIN_CHANGED:
+            # Nothing in the buffered frames: also judge the first one captured after the edge
+            if wait_for_frame(trigger_ts, MOTION_VERIFY_MAX_WAIT):
+                recent = _recent_frames(since)
+                changed = _changed(recent)
+        if changed is None:
+            log_event(f"Motion verify skipped ({len(recent)} frames buffered), escalating",
+                      event_type="motion_verify", source="motion_verify", zone=zone)
+            return True
+        # Recent frames become history for the next trigger
+        _update_background(recent)
+
+    confirmed = changed >= MOTION_VERIFY_MIN_CHANGED
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log_event(f"Motion verify: changed={changed:.1%} threshold={MOTION_VERIFY_MIN_CHANGED:.1%} "
+              f"delta={MOTION_VERIFY_PIXEL_DELTA} frames={len(recent)} {elapsed_ms:.1f}ms -> "
+              f"{'confirmed' if confirmed else 'rejected'}",
+              event_type="motion_verify", source="motion_verify", zone=zone)
+    return confirmed
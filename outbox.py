@@ -0,0 +1,168 @@
+"""
+Persistent store-and-forward outbox for SMS/MMS.
+
+Every queued message and every state change is appended to an fsync'd JSON
+journal, so pending alerts survive a crash or a modem brownout and are
+delivered once the modem is back. The journal is rewritten (atomically) with
+only the pending entries after OUTBOX_COMPACT_AFTER entries have finished.
+"""
+import os
+import json
+import time
+import threading
+from config import OUTBOX_FILE, OUTBOX_ORDER, OUTBOX_COMPACT_AFTER
+from utils import log_event, trim_torn_tail
+
+_cond = threading.Condition()
+_pending = {}  # id -> entry
+_next_id = 1
+_journal = None
+_finished_since_compact = 0
+_listeners = []  # called (under _cond) whenever a message may have become due
+
+def _notify():
+    """Wake the delivery worker. Caller holds _cond."""
+    _cond.notify()
+    for listener in _listeners:
+        listener()
+
+def add_listener(callback):
+    """Also call callback() whenever take() would wake (for a worker that uses poll())."""
+    with _cond:
+        _listeners.append(callback)
+
+def _append(rec):
+    _journal.write(json.dumps(rec) + "\n")
+    _journal.flush()
+    os.fsync(_journal.fileno())
+
+def _load():
+    """Replay the journal into _pending. Caller holds _cond."""
+    global _journal, _next_id
+    if _journal is not None:
+        return
+    os.makedirs(os.path.dirname(OUTBOX_FILE), exist_ok=True)
+    if trim_torn_tail(OUTBOX_FILE):
+        log_event("Outbox: dropped a torn last journal line")
+    if os.path.exists(OUTBOX_FILE):
+        with open(OUTBOX_FILE) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # corrupt line
+                op = rec.pop("op")
+                if op == "add":
+                    _pending[rec["id"]] = rec
+                elif op == "retry" and rec["id"] in _pending:
+                    _pending[rec["id"]].update(rec)
+                elif op in ("done", "drop"):
+                    _pending.pop(rec["id"], None)
+                _next_id = max(_next_id, rec["id"] + 1)
+    _journal = open(OUTBOX_FILE, "a")
+    if _pending:
+        log_event(f"Outbox: {len(_pending)} undelivered message(s) recovered")
+
+def _compact():
+    """Rewrite the journal with only pending entries. Caller holds _cond."""
+    global _journal, _finished_since_compact
+    tmp = OUTBOX_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        for entry in _pending.values():
+            f.write(json.dumps(dict(entry, op="add")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    _journal.close()
+    os.replace(tmp, OUTBOX_FILE)
+    _journal = open(OUTBOX_FILE, "a")
+    _finished_since_compact = 0
+
+def add(kind, payload, priority):
+    """Persist a new message and wake the delivery worker. Returns its id."""
+    global _next_id
+    with _cond:
+        _load()
+        entry = {
+            "id": _next_id,
+            "kind": kind,
+            "priority": priority,
+            "created": time.time(),
+            "attempts": 0,
+            "not_before": 0,
+            "payload": payload,
+        }
+        _next_id += 1
+        _append(dict(entry, op="add"))
+        _pending[entry["id"]] = entry
+        _notify()
+        return entry["id"]
+
+def pending_count():
+    with _cond:
+        _load()
+        return len(_pending)
+
+def _order_key(entry):
+    if OUTBOX_ORDER == "oldest":
+        return entry["id"]
+    return (entry["priority"], entry["id"])
+
+def _due():
+    """Returns (entry, None) for the next due message, or (None, seconds until one is due / None)."""
+    now = time.time()
+    due = [e for e in _pending.values() if e["not_before"] <= now]
+    if due:
+        return dict(min(due, key=_order_key)), None
+    if _pending:
+        return None, min(e["not_before"] for e in _pending.values()) - now
+    return None, None
+
+def take():
+    """Block until a message is due and return it (it stays pending until finished)."""
+    with _cond:
+        _load()
+        entry, wait = _due()
+        while entry is None:
+            _cond.wait(wait)
+            entry, wait = _due()
+        return entry
+
+def poll():
+    """take() without blocking: (entry, None), or (None, seconds until one is due / None)."""
+    with _cond:
+        _load()
+        return _due()
+
+def retry(entry_id, payload, delay):
+    """Keep the message pending with an updated payload, due again after `delay` seconds."""
+    with _cond:
+        entry = _pending.get(entry_id)
+        if entry is None:
+            return
+        entry["attempts"] += 1
+        entry["not_before"] = time.time() + delay
+        entry["payload"] = payload
+        _append({"op": "retry", "id": entry_id, "attempts": entry["attempts"],
+                 "not_before": entry["not_before"], "payload": payload})
+
+def reschedule_all(not_before):
+    """Move every pending message's next attempt to `not_before` (in memory only).
+
+    Used when the modem itself is down or has just come back, so messages
+    don't each probe the port on their own backoff schedule.
+    """
+    with _cond:
+        for entry in _pending.values():
+            entry["not_before"] = not_before
+        _notify()
+
+def finish(entry_id, delivered=True):
+    """Remove a message from the outbox, either delivered or given up on."""
+    global _finished_since_compact
+    with _cond:
+        if _pending.pop(entry_id, None) is None:
+            return
+        _append({"op": "done" if delivered else "drop", "id": entry_id})
+        _finished_since_compact += 1
+        if _finished_since_compact >= OUTBOX_COMPACT_AFTER:
+            _compact()
@@ -0,0 +1,82 @@
+"""
+Event-triggered clip recording.
+
+trigger_recording() starts (or extends) one clip in LOG_DIR. The clip opens
+with CLIP_PREROLL_SECONDS of frames already in the camera ring buffer and
+runs until CLIP_POSTROLL_SECONDS after the last trigger, capped at
+CLIP_MAX_SECONDS. Encoding runs on its own thread, one frame at a time, so
+memory stays bounded by the camera ring.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+import cv2
+from config import (LOG_DIR, CAMERA_CAPTURE_FPS, CLIP_PREROLL_SECONDS,
+                    CLIP_POSTROLL_SECONDS, CLIP_MAX_SECONDS)
+from camera_module import get_frames
+from utils import log_event
+
+_lock = threading.Lock()
+_active = None  # the clip being recorded, if any
+
+def trigger_recording(reason):
+    """Start a clip for `reason` or extend the running one. Returns the clip path."""
+    global _active
+    now = time.time()
+    with _lock:
+        if _active is not None:
+            _active["until"] = min(now + CLIP_POSTROLL_SECONDS,
+                                   _active["started"] + CLIP_MAX_SECONDS)
+            return _active["path"]
+        ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        clip = {
+            "path": os.path.join(LOG_DIR, f"clip_{reason}_{ts}.avi"),
+            "reason": reason,
+            "started": now,
+            "until": now + CLIP_POSTROLL_SECONDS,
+        }
+        _active = clip
+    threading.Thread(target=_record, args=(clip,), name="clip-recorder", daemon=True).start()
+    return clip["path"]
+
+def _to_bgr(frame):
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return cv2.cvtColor(frame[..., :3], cv2.COLOR_RGB2BGR)
+
+def _record(clip):
+    global _active
+    writer = None
+    frames = 0
+    last_ts = clip["started"] - CLIP_PREROLL_SECONDS
+    try:
+        while True:
+            for ts, frame in get_frames(start=last_ts + 1e-6):
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    writer = cv2.VideoWriter(clip["path"], cv2.VideoWriter_fourcc(*"MJPG"),
+                                             CAMERA_CAPTURE_FPS, (w, h))
+                writer.write(_to_bgr(frame))
+                frames += 1
+                last_ts = ts
+            with _lock:
+                if time.time() >= clip["until"]:
+                    _active = None
+                    break
+            time.sleep(1.0 / CAMERA_CAPTURE_FPS)
+    except Exception as e:
+        log_event(f"Clip recording error: {e}")
+        with _lock:
+            if _active is clip:
+                _active = None
+    finally:
+        if writer is not None:
+            writer.release()
+
+    if frames:
+        duration = time.time() - clip["started"]
+        log_event(f"Clip saved: {clip['path']} ({frames} frames, {duration:.0f}s + pre-roll)",
+                  event_type="clip_saved", source="recorder", clip=clip["path"])
+    else:
+        log_event(f"Clip {clip['path']} not saved: no camera frames")
@@ -1,59 +1,275 @@
-from mfrc522 import SimpleMFRC522
-from utils import log_event
+"""
+RFID reader service.
+
+One thread owns the MFRC522. It sleeps on the reader's IRQ line
+(PIN_RFID_IRQ) and only talks to the card when one answers a presence
+request, falling back to a slow poll if the IRQ line can't be opened. Each
+scan is published as an "rfid_scan" event; handle_rfid() is the access
+check subscribed to it, and the registration commands take the next scan
+with wait_for_scan() instead of reading the reader themselves.
+
+Under the asyncio runtime the reader is a task instead: the IRQ edge wakes
+it through gpiozero's when_activated callback, presence requests are sent
+from the loop and only the card read itself goes to the driver pool.
+
+A card held on the reader is reported once; it is reported again only
+after it has been out of the field for RFID_DEBOUNCE_SECONDS (every sighting
+restarts that timer). Different cards can be read back to back.
+
+Denied scans are only counted here and handed to denied_scan_handler on its
+own worker, so the access check never waits on the camera or modem. Scans
+inside RFID_DENIED_WINDOW are counted together: the first one alerts, the
+RFID_ESCALATE_ATTEMPTS-th raises one brute-force alert with the attempt
+counts, and the rest are logged only.
+"""
+from utils import log_event, event_loop, start_task, run_blocking
 import time
-from threading import Timer
+import queue
+import threading
+from collections import deque
+from scheduler import call_later
+from event_bus import publish, subscribe
+from config import (DEVICE_RETRY_INTERVAL, PIN_RFID_IRQ, RFID_DEBOUNCE_SECONDS,
+                    RFID_REQA_INTERVAL, RFID_POLL_INTERVAL, RFID_REGISTER_TIMEOUT,
+                    RFID_DENIED_WINDOW, RFID_ESCALATE_ATTEMPTS)
+from devices import device, DeviceUnavailable
+from recorder import trigger_recording
+from actuators import hold_outputs, release_outputs
+from camera_module import capture_image
+from alerts import report_alert
+from gsm_module import PRIORITY_EMERGENCY
+import whitelist
+
+def _open_reader():
+    from mfrc522 import SimpleMFRC522
+    return SimpleMFRC522()
+
+def _open_irq():
+    from gpiozero import DigitalInputDevice
+    return DigitalInputDevice(PIN_RFID_IRQ, pull_up=True)  # IRQ is active low
+
+get_rfid_reader = device("rfid", _open_reader)
+get_rfid_irq = device("rfid_irq", _open_irq)
+
+_last_seen = {}          # uid -> monotonic time it was last in the field
+_claims = []             # queues of callers waiting for the next scan (registration)
+_claims_lock = threading.Lock()
+_reader_thread = None    # reader thread, or the task's Future under asyncio
 
-# Import from main to avoid circular import
-import main
+# Sliding window of denied scans: (monotonic time, uid), oldest first.
+# Only touched by handle_rfid, which runs on a single bus worker.
+_denied = deque()
+_denied_by_uid = {}      # uid -> attempts inside the window
 
-rfid_reader = SimpleMFRC522()
-RFID_WHITELIST = {}
+def rfid_available():
+    """True if the reader could be opened (opens it on first call)."""
+    try:
+        get_rfid_reader()
+        return True
+    except Exception:
+        return False
 
 def normalize_uid(uid):
     """Convert UID to consistent string format"""
     return str(uid).strip()
 
-def handle_rfid():
-    """Monitor RFID reader for card scans"""
+# === MFRC522 IRQ handling ===
+def _arm_irq(mfrc):
+    """Route the receive interrupt to the IRQ pin (active low) and clear pending flags."""
+    mfrc.Write_MFRC522(0x04, 0x7F)   # CommIrqReg: Set1=0 clears all pending flags
+    mfrc.Write_MFRC522(0x02, 0xA0)   # CommIEnReg: IRqInv | RxIEn
+
+def _send_reqa(mfrc):
+    """Ask any card in the field to answer; its reply raises the IRQ."""
+    mfrc.Write_MFRC522(0x09, 0x26)   # FIFODataReg <- REQA
+    mfrc.Write_MFRC522(0x01, 0x0C)   # CommandReg: Transceive
+    mfrc.Write_MFRC522(0x0D, 0x87)   # BitFramingReg: StartSend, 7-bit frame
+
+def _wait_for_card(reader, irq):
+    """Block until a card answers, then return its UID (None if it left before the read)."""
+    if irq is None:
+        time.sleep(RFID_POLL_INTERVAL)
+        return reader.read_id_no_block()
+    mfrc = reader.READER
+    _arm_irq(mfrc)
+    while True:
+        _send_reqa(mfrc)
+        if irq.wait_for_active(timeout=RFID_REQA_INTERVAL):
+            break
+    return _read_card(reader)
+
+def _read_card(reader):
+    """Read the UID of the card that raised the IRQ."""
+    reader.READER.MFRC522_Init()  # leave the transceive state before the normal read
+    return reader.read_id_no_block()
+
+async def _wait_for_card_async(reader, irq, answered):
+    """_wait_for_card() for the reader task; `answered` is set by the IRQ edge."""
+    import asyncio
+    if irq is None:
+        await asyncio.sleep(RFID_POLL_INTERVAL)
+        return await run_blocking(reader.read_id_no_block)
+    mfrc = reader.READER
+    _arm_irq(mfrc)
+    while True:
+        answered.clear()
+        _send_reqa(mfrc)  # three register writes
+        if irq.is_active:
+            break
+        try:
+            await asyncio.wait_for(answered.wait(), RFID_REQA_INTERVAL)
+            break
+        except asyncio.TimeoutError:
+            pass
+    return await run_blocking(_read_card, reader)
+
+def _debounced(uid, now):
+    """True if `uid` was already in the field within the debounce time."""
+    last = _last_seen.get(uid)
+    _last_seen[uid] = now
+    if len(_last_seen) > 1000:
+        for old in [u for u, t in _last_seen.items() if now - t > RFID_DEBOUNCE_SECONDS]:
+            del _last_seen[old]
+    return last is not None and now - last < RFID_DEBOUNCE_SECONDS
+
+def _reader_loop():
     log_event("RFID monitoring started")
-    
+    irq = None
     while True:
         try:
-            log_event("Waiting for RFID card...")
-            card_id, text = rfid_reader.read()  # This blocks until card is detected
-            uid_str = normalize_uid(card_id)
-            
-            if uid_str in RFID_WHITELIST:
-                user_name = RFID_WHITELIST[uid_str]
-                log_event(f"✅ Authorized RFID: {user_name} ({uid_str})")
-                
-                # Set authorized user status
-                main.set_authorized_user(user_name)
-                
-                # Auto-logout after 8 hours (28800 seconds)
-                def auto_logout():
-                    main.clear_authorized_user()
-                    log_event(f"Auto-logout: {user_name} session expired")
-                
-                Timer(28800, auto_logout).start()
-                
-            else:
-                log_event(f"❌ Unauthorized RFID: {uid_str}")
-                # Still trigger security measures for unknown cards
-                from actuators import buzzer_on, buzzer_off
-                from camera_module import capture_image
-                from gsm_module import send_sms, send_image_mms
-                
-                buzzer_on()
-                image_path = capture_image("unauthorized_rfid")
-                send_sms(f"SECURITY ALERT: Unauthorized RFID card detected at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-                if image_path:
-                    send_image_mms(image_path, "Unauthorized RFID attempt")
-                
-                Timer(5, buzzer_off).start()
-            
-            time.sleep(2)  # Prevent rapid re-reads
-            
+            reader = get_rfid_reader()
+            if irq is None:
+                try:
+                    irq = get_rfid_irq()
+                except DeviceUnavailable:
+                    pass  # poll instead; the IRQ line is retried on the next pass
+            card_id = _wait_for_card(reader, irq)
+            if card_id is not None:
+                _on_card(card_id)
+        except DeviceUnavailable:
+            time.sleep(DEVICE_RETRY_INTERVAL)
         except Exception as e:
             log_event(f"RFID error: {e}")
             time.sleep(1)
+
+async def _reader_task():
+    import asyncio
+    loop = asyncio.get_running_loop()
+    answered = asyncio.Event()
+    log_event("RFID monitoring started")
+    irq = None
+    while True:
+        try:
+            reader = await run_blocking(get_rfid_reader)
+            if irq is None:
+                try:
+                    irq = await run_blocking(get_rfid_irq)
+                    irq.when_activated = lambda: loop.call_soon_threadsafe(answered.set)
+                except DeviceUnavailable:
+                    pass  # poll instead; the IRQ line is retried on the next pass
+            card_id = await _wait_for_card_async(reader, irq, answered)
+            if card_id is not None:
+                _on_card(card_id)
+        except DeviceUnavailable:
+            await asyncio.sleep(DEVICE_RETRY_INTERVAL)
+        except Exception as e:
+            log_event(f"RFID error: {e}")
+            await asyncio.sleep(1)
+
+def _on_card(card_id):
+    """Hand a read card to a waiting registration, or publish it (debounced)."""
+    uid_str = normalize_uid(card_id)
+    with _claims_lock:
+        claim = _claims.pop(0) if _claims else None
+    if claim is not None:
+        _last_seen[uid_str] = time.monotonic()
+        claim.put(uid_str)
+        publish("rfid_scan", uid=uid_str, claimed=True)
+    elif not _debounced(uid_str, time.monotonic()):
+        publish("rfid_scan", uid=uid_str, claimed=False)
+
+def start_rfid_reader():
+    """Subscribe the access check and start the reader thread (a task under asyncio)."""
+    global _reader_thread
+    if _reader_thread is not None:
+        return
+    subscribe("rfid_scan", handle_rfid, max_concurrency=1)
+    subscribe("rfid_denied", denied_scan_handler, max_concurrency=1)
+    if event_loop() is not None:
+        _reader_thread = start_task(_reader_task())
+        return
+    _reader_thread = threading.Thread(target=_reader_loop, name="rfid-reader", daemon=True)
+    _reader_thread.start()
+
+def wait_for_scan(timeout=RFID_REGISTER_TIMEOUT):
+    """Take the next scanned UID for the caller, bypassing the access check.
+
+    Returns None if no card is presented within `timeout` seconds.
+    """
+    claim = queue.Queue(maxsize=1)
+    with _claims_lock:
+        _claims.append(claim)
+    try:
+        return claim.get(timeout=timeout)
+    except queue.Empty:
+        with _claims_lock:
+            if claim in _claims:
+                _claims.remove(claim)
+                return None
+        return claim.get()  # a scan was handed over as we timed out
+
+def handle_rfid(event):
+    """Access check for one scan (event bus worker)."""
+    if event["claimed"]:
+        return  # taken by the registration flow
+    uid_str = event["uid"]
+    user_name = whitelist.lookup(uid_str)
+    if user_name is not None:
+        log_event(f"✅ Authorized RFID: {user_name} ({uid_str})", event_type="rfid_authorized",
+                  source="rfid", uid=uid_str)
+        
+        # Session tracking (and its auto-logout) is handled by the subscriber in main
+        publish("rfid_authorized", uid=uid_str, name=user_name)
+        
+    else:
+        attempts, total = _count_denied(uid_str, time.monotonic())
+        publish("rfid_denied", uid=uid_str, attempts=attempts, total=total,
+                cards=dict(_denied_by_uid))
+
+def _count_denied(uid, now):
+    """Add a denied scan to the window. Returns (attempts with this uid, attempts with any card)."""
+    while _denied and now - _denied[0][0] > RFID_DENIED_WINDOW:
+        _, old = _denied.popleft()
+        _denied_by_uid[old] -= 1
+        if not _denied_by_uid[old]:
+            del _denied_by_uid[old]
+    _denied.append((now, uid))
+    _denied_by_uid[uid] = _denied_by_uid.get(uid, 0) + 1
+    return _denied_by_uid[uid], len(_denied)
+
+def denied_scan_handler(event):
+    """Security response to a denied scan (own bus worker, off the reader path)."""
+    uid_str, total = event["uid"], event["total"]
+    clip = trigger_recording("unauthorized_rfid")
+    log_event(f"❌ Unauthorized RFID: {uid_str} (attempt {event['attempts']} with this card, "
+              f"{total} in {RFID_DENIED_WINDOW}s)", event_type="rfid_denied",
+              source="rfid", uid=uid_str, clip=clip)
+    hold_outputs("rfid", light=False)
+    call_later(5, release_outputs, "rfid", key="rfid_buzzer_off")
+
+    if total == 1:
+        image_path = capture_image("unauthorized_rfid")
+        report_alert("unauthorized_rfid",
+                     sms_text=f"SECURITY ALERT: Unauthorized RFID card detected at {time.strftime('%Y-%m-%d %H:%M:%S')}",
+                     image_path=image_path, mms_caption="Unauthorized RFID attempt")
+    elif total == RFID_ESCALATE_ATTEMPTS:
+        cards = sorted(event["cards"].items(), key=lambda item: -item[1])
+        detail = ", ".join(f"{uid} x{n}" for uid, n in cards)
+        log_event(f"RFID brute-force suspected: {total} denied scans in {RFID_DENIED_WINDOW}s ({detail})",
+                  event_type="rfid_bruteforce", source="rfid", uid=uid_str, clip=clip)
+        image_path = capture_image("rfid_bruteforce")
+        report_alert("rfid_bruteforce",
+                     sms_text=f"SECURITY ALERT: {total} unauthorized RFID attempts with {len(cards)} card(s) "
+                              f"in {RFID_DENIED_WINDOW // 60} min at {time.strftime('%Y-%m-%d %H:%M:%S')} ({detail})",
+                     image_path=image_path, mms_caption=f"RFID brute force: {total} attempts",
+                     priority=PRIORITY_EMERGENCY)
@@ -0,0 +1,123 @@
+"""
+Per-sensor sampling lanes.
+
+Each sensor gets its own thread with its own period, so a slow read (the
+DHT22's read_retry can take seconds) never delays the smoke and flame
+checks. Lanes run on a fixed grid (start + k * interval): a read that
+overruns skips the periods it missed instead of bursting to catch up.
+Jitter, deadline misses, skipped periods and failures are tracked per lane.
+
+Under the asyncio runtime each lane is a task instead. Fast reads (a GPIO
+pin) run on the loop; lanes added with blocking=True (DHT, ADC) read on the
+driver pool, and on_sample always runs on the loop's worker pool.
+"""
+import threading
+import time
+from utils import log_event, event_loop, start_task, run_blocking
+
+_lock = threading.Lock()
+_lanes = {}
+
+def add_sensor(name, read, interval, deadline, on_sample, blocking=False):
+    """Sample read() every `interval` seconds and pass the value to on_sample(value).
+
+    A read taking longer than `deadline` counts as a missed deadline; a read
+    that raises counts as a failure and is passed on as None.
+    """
+    lane = {
+        "name": name,
+        "interval": interval,
+        "deadline": deadline,
+        "samples": 0,
+        "failures": 0,
+        "missed_deadlines": 0,
+        "skipped_periods": 0,
+        "jitter_total": 0.0,
+        "jitter_max": 0.0,
+        "read_max": 0.0,
+        "last_value": None,
+    }
+    with _lock:
+        _lanes[name] = lane
+    if event_loop() is not None:
+        start_task(_lane_task(lane, read, on_sample, blocking))
+    else:
+        threading.Thread(target=_lane_loop, args=(lane, read, on_sample),
+                         name=f"sample-{name}", daemon=True).start()
+
+def _lane_loop(lane, read, on_sample):
+    next_due = time.monotonic()
+    while True:
+        delay = next_due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        started = time.monotonic()
+        value = _read(lane, read)
+        _account(lane, value, started - next_due, time.monotonic() - started)
+        _deliver(lane, on_sample, value)
+        next_due = _advance(lane, next_due)
+
+async def _lane_task(lane, read, on_sample, blocking):
+    import asyncio
+    loop = asyncio.get_running_loop()
+    next_due = time.monotonic()
+    while True:
+        delay = next_due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        started = time.monotonic()
+        value = await run_blocking(_read, lane, read) if blocking else _read(lane, read)
+        _account(lane, value, started - next_due, time.monotonic() - started)
+        await loop.run_in_executor(None, _deliver, lane, on_sample, value)
+        next_due = _advance(lane, next_due)
+
+def _read(lane, read):
+    try:
+        return read()
+    except Exception as e:
+        lane["failures"] += 1
+        log_event(f"Sensor {lane['name']} read error: {e}")
+        return None
+
+def _account(lane, value, jitter, took):
+    lane["samples"] += 1
+    lane["jitter_total"] += jitter
+    lane["jitter_max"] = max(lane["jitter_max"], jitter)
+    lane["read_max"] = max(lane["read_max"], took)
+    lane["last_value"] = value
+    if took > lane["deadline"]:
+        lane["missed_deadlines"] += 1
+
+def _deliver(lane, on_sample, value):
+    try:
+        on_sample(value)
+    except Exception as e:
+        log_event(f"Sensor {lane['name']} handler error: {e}")
+
+def _advance(lane, next_due):
+    """Next grid point after next_due, skipping any periods already missed."""
+    interval = lane["interval"]
+    next_due += interval
+    behind = time.monotonic() - next_due
+    if behind > 0:
+        skipped = int(behind // interval) + 1
+        lane["skipped_periods"] += skipped
+        next_due += skipped * interval
+    return next_due
+
+def sampler_stats():
+    with _lock:
+        lanes = list(_lanes.values())
+    return [dict(lane, jitter_avg=lane["jitter_total"] / (lane["samples"] or 1)) for lane in lanes]
+
+def print_sampler_stats():
+    stats = sampler_stats()
+    if not stats:
+        print("No sensors sampling")
+        return
+    print(f"{'sensor':<8} {'every s':>7} {'samples':>8} {'fail':>5} {'missed':>6} {'skipped':>7} "
+          f"{'jit avg ms':>10} {'jit max ms':>10} {'read max ms':>11}  last")
+    for s in stats:
+        print(f"{s['name']:<8} {s['interval']:>7} {s['samples']:>8} {s['failures']:>5} "
+              f"{s['missed_deadlines']:>6} {s['skipped_periods']:>7} {s['jitter_avg'] * 1000:>10.1f} "
+              f"{s['jitter_max'] * 1000:>10.1f} {s['read_max'] * 1000:>11.1f}  {s['last_value']}")
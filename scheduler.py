@@ -0,0 +1,178 @@
+"""
+Single-thread timer scheduler.
+
+Replaces one threading.Timer (one OS thread) per delayed action with a
+min-heap served by one thread. call_later() returns a Job that can be
+cancelled or rescheduled; passing a `key` makes repeated requests for the
+same target (e.g. "turn the light off in 5 min") extend one deadline
+instead of stacking up timers. Callbacks run on the scheduler thread and
+must be quick; anything slow should hand off to a queue.
+
+Under the asyncio runtime the heap is served by a task on the event loop
+instead, and callbacks run one at a time on a dedicated worker thread, so
+they never queue behind slow bus handlers.
+"""
+import heapq
+import itertools
+import threading
+import time
+from utils import log_event, event_loop, start_task
+
+_cond = threading.Condition()
+_heap = []                 # (deadline, seq, version, job)
+_seq = itertools.count()
+_keyed = {}                # key -> pending Job
+_stale = 0                 # heap entries left behind by cancel/reschedule
+_runner = None             # scheduler thread, or the task's Future under asyncio
+_wakeup = None             # asyncio.Event set by _push (asyncio runtime)
+
+class Job:
+    """Handle for a scheduled call."""
+
+    def __init__(self, func, args, key):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.deadline = None
+        self.cancelled = False
+        self.version = 0
+
+    def cancel(self):
+        cancel(self)
+
+    def reschedule(self, delay):
+        reschedule(self, delay)
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic()) if self.deadline else 0.0
+
+def _start():
+    global _runner
+    if _runner is None:
+        if event_loop() is not None:
+            _runner = start_task(_run_async())
+        else:
+            _runner = threading.Thread(target=_run, name="scheduler", daemon=True)
+            _runner.start()
+
+def _wake():
+    """Caller holds _cond."""
+    _cond.notify()
+    if _wakeup is not None:
+        event_loop().call_soon_threadsafe(_wakeup.set)
+
+def _push(job, deadline):
+    """Caller holds _cond."""
+    global _stale
+    if job.deadline is not None:
+        _stale += 1  # the previous heap entry for this job is now dead
+    job.version += 1
+    job.deadline = deadline
+    heapq.heappush(_heap, (deadline, next(_seq), job.version, job))
+    if _stale > 64 and _stale > len(_heap) // 2:
+        _compact()
+    _wake()
+
+def _compact():
+    """Drop dead heap entries. Caller holds _cond."""
+    global _heap, _stale
+    _heap = [e for e in _heap if not e[3].cancelled and e[2] == e[3].version]
+    heapq.heapify(_heap)
+    _stale = 0
+
+def call_later(delay, func, *args, key=None):
+    """Run func(*args) after `delay` seconds. Returns a Job.
+
+    With a key, an already pending job for that key is pushed out to the new
+    deadline (never pulled in) and returned instead of adding a second one.
+    """
+    deadline = time.monotonic() + delay
+    with _cond:
+        _start()
+        if key is not None:
+            job = _keyed.get(key)
+            if job is not None and not job.cancelled:
+                job.func, job.args = func, args
+                if deadline > job.deadline:
+                    _push(job, deadline)
+                return job
+        job = Job(func, args, key)
+        if key is not None:
+            _keyed[key] = job
+        _push(job, deadline)
+        return job
+
+def reschedule(job, delay):
+    """Move a pending job to now + delay (earlier or later)."""
+    with _cond:
+        if job.cancelled or job.deadline is None:
+            return
+        _push(job, time.monotonic() + delay)
+
+def cancel(job):
+    global _stale
+    with _cond:
+        if job.cancelled:
+            return
+        job.cancelled = True
+        _stale += 1
+        if job.key is not None and _keyed.get(job.key) is job:
+            del _keyed[job.key]
+
+def pending_jobs():
+    with _cond:
+        return len(_heap) - _stale
+
+def _next():
+    """Pop the next due job. Returns (job, None), or (None, seconds to wait / None). Caller holds _cond."""
+    global _stale
+    while _heap:
+        deadline, _, version, job = _heap[0]
+        if job.cancelled or version != job.version:
+            heapq.heappop(_heap)
+            _stale -= 1
+            continue
+        wait = deadline - time.monotonic()
+        if wait > 0:
+            return None, wait
+        heapq.heappop(_heap)
+        job.cancelled = True  # fired; no further cancel/reschedule
+        job.deadline = None
+        if job.key is not None and _keyed.get(job.key) is job:
+            del _keyed[job.key]
+        return job, None
+    return None, None
+
+def _call(job):
+    try:
+        job.func(*job.args)
+    except Exception as e:
+        log_event(f"Scheduled job {getattr(job.func, '__name__', job.func)} failed: {e}")
+
+def _run():
+    while True:
+        with _cond:
+            job, wait = _next()
+            while job is None:
+                _cond.wait(wait)
+                job, wait = _next()
+        _call(job)
+
+async def _run_async():
+    global _wakeup
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.get_running_loop()
+    callbacks = ThreadPoolExecutor(1, thread_name_prefix="scheduler")
+    _wakeup = asyncio.Event()
+    while True:
+        with _cond:
+            _wakeup.clear()  # a _push after this point sets it again
+            job, wait = _next()
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await loop.run_in_executor(callbacks, _call, job)
@@ -1,179 +1,359 @@
+import os
+import json
 from gpiozero import MotionSensor, DigitalInputDevice
-from threading import Thread, Timer
-from actuators import light_on, light_off, buzzer_on, buzzer_off
+from threading import Thread
+from scheduler import call_later
+from actuators import hold_outputs, release_outputs
 from camera_module import capture_image, is_dark
-from gsm_module import send_sms, send_image_mms
-import Adafruit_DHT
-from time import sleep, time
-from utils import log_event
-import main  # Import to check authorized user status
+from gsm_module import PRIORITY_EMERGENCY, PRIORITY_NOTICE
+from alerts import report_alert
+from recorder import trigger_recording
+from motion_verify import verify_motion
+from config import MOTION_VERIFY_ENABLED
+from event_bus import publish, subscribe
+from sampler import add_sensor
+from config import (FLAME_SAMPLE_INTERVAL, FLAME_SAMPLE_DEADLINE, SMOKE_SAMPLE_INTERVAL,
+                    SMOKE_SAMPLE_DEADLINE, DHT_SAMPLE_INTERVAL, DHT_SAMPLE_DEADLINE,
+                    ALARM_RESET_SECONDS, SMOKE_DATA_RATE, SMOKE_MEDIAN_WINDOW, SMOKE_EWMA_ALPHA,
+                    SMOKE_ROR_WINDOW, SMOKE_ROR_THRESHOLD, SMOKE_ROR_MIN_MARGIN, TS_SMOKE_RECORD_INTERVAL,
+                    SMOKE_CALIBRATION_FILE, SMOKE_CALIBRATION_MAX_AGE, SMOKE_THRESHOLD_MARGIN,
+                    SMOKE_DEFAULT_THRESHOLD, SMOKE_RECALIBRATE_INTERVAL, SMOKE_MAX_DRIFT)
+from filters import TrendFilter
+from devices import device, DeviceUnavailable
+from timeseries import record
+from time import time, strftime, monotonic
+from statistics import median
+from utils import log_event, event_loop
+import sessions
 
 # === Motion Sensors ===
-pir1 = MotionSensor(23)
-pir2 = MotionSensor(24)
+get_pirs = device("pir", lambda: {"pir1": MotionSensor(23), "pir2": MotionSensor(24)})
 
-def motion_worker():
-    log_event("Motion detected")
+def motion_worker(event):
+    """Route a PIR event to the authorized or intruder handler."""
+    zone = event.get("zone")
+    log_event("Motion detected", event_type="motion", source="sensors", zone=zone)
     
     # Check if authorized user is present
-    if main.is_authorized_user_present():
-        user_name = main.get_authorized_user_name()
-        log_event(f"Motion from authorized user: {user_name}")
-        
-        # Only turn on light if dark, NO buzzer for authorized users
-        if is_dark():
-            light_on()
-            log_event("Light turned on for authorized user in dark room")
-            
-            # Send camera feed to show room status
-            image_path = capture_image("authorized_motion")
-            if image_path:
-                send_image_mms(image_path, f"Room activity - {user_name}")
-        
-        # Turn off light after 5 minutes for authorized users
-        def reset_light():
-            light_off()
-            log_event("Light turned off after authorized user activity")
-        
-        Timer(300, reset_light).start()  # 5 minutes = 300 seconds
-        
+    if sessions.is_anyone_present():  # lock-free snapshot read
+        publish("authorized_motion", zone=zone, trigger_ts=event["ts"])
     else:
-        # Unauthorized motion - full security response
-        log_event("SECURITY ALERT: Unauthorized motion detected!")
-        
-        if is_dark():
-            light_on()
-        
-        buzzer_on()
-        image_path = capture_image("intruder_motion")
+        publish("intruder_motion", zone=zone, trigger_ts=event["ts"])
+
+def authorized_motion_handler(event):
+    zone = event.get("zone")
+    user_name = sessions.present_user_names()
+    log_event(f"Motion from authorized user: {user_name}", event_type="authorized_motion",
+              source="sensors", zone=zone)
+    
+    # Only turn on light if dark, NO buzzer for authorized users
+    if is_dark():
+        hold_outputs("authorized_light", buzzer=False)
+        log_event("Light turned on for authorized user in dark room")
         
-        # Send security alert
-        send_sms(f"SECURITY ALERT: Unauthorized motion detected at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        # Send camera feed to show room status
+        image_path = capture_image("authorized_motion")
         if image_path:
-            send_image_mms(image_path, "INTRUDER ALERT - Motion detected")
-        
-        # Turn off buzzer and light after 30 seconds for intruders
-        def reset_actuators():
-            buzzer_off()
-            light_off()
-            log_event("Security actuators reset after intruder alert")
-        
-        Timer(30, reset_actuators).start()
+            report_alert("authorized_motion", image_path=image_path,
+                         mms_caption=f"Room activity - {user_name}", priority=PRIORITY_NOTICE)
+    
+    # Turn off light after 5 minutes for authorized users
+    def reset_light():
+        release_outputs("authorized_light")
+        log_event("Light turned off after authorized user activity")
+    
+    # 5 minutes after the latest motion; repeated motion extends the same deadline
+    call_later(300, reset_light, key="authorized_light_off")
+
+def intruder_motion_handler(event):
+    zone = event.get("zone")
+    # PIRs false-trigger on heat/sunlight: optionally confirm with the camera first
+    if MOTION_VERIFY_ENABLED and not verify_motion(event["trigger_ts"], zone):
+        log_event("PIR trigger not confirmed by camera, no alarm", event_type="motion_unconfirmed",
+                  source="sensors", zone=zone)
+        return
+
+    # Unauthorized motion - full security response
+    clip = trigger_recording("intruder_motion")
+    log_event("SECURITY ALERT: Unauthorized motion detected!", event_type="intruder_alert",
+              source="sensors", zone=zone, clip=clip)
+    
+    hold_outputs("intruder", light=is_dark())
+    image_path = capture_image("intruder_motion")
+    
+    # Send security alert (merged with other triggers inside the cooldown)
+    report_alert("intruder_motion",
+                 sms_text=f"SECURITY ALERT: Unauthorized motion detected at {strftime('%Y-%m-%d %H:%M:%S')}",
+                 image_path=image_path, mms_caption="INTRUDER ALERT - Motion detected")
+    
+    # Turn off buzzer and light after 30 seconds for intruders
+    def reset_actuators():
+        release_outputs("intruder")
+        log_event("Security actuators reset after intruder alert")
+    
+    call_later(30, reset_actuators, key="intruder_reset")
 
 def start_motion_monitor():
-    pir1.when_motion = motion_worker
-    pir2.when_motion = motion_worker
+    # gpiozero callbacks only publish; handlers run on the event bus workers
+    subscribe("motion", motion_worker, max_concurrency=2)
+    subscribe("authorized_motion", authorized_motion_handler, max_concurrency=1)
+    subscribe("intruder_motion", intruder_motion_handler, max_concurrency=1)
+    for zone, pir in get_pirs().items():
+        pir.when_motion = lambda zone=zone: publish("motion", zone=zone)
 
 # === Temp & Humidity (DHT22) ===
 DHT_PIN = 5
-DHT_SENSOR = Adafruit_DHT.DHT22
+
+def _init_dht():
+    import Adafruit_DHT
+    return Adafruit_DHT
+
+get_dht = device("dht", _init_dht)
 
 def read_temp_humidity():
-    humidity, temperature = Adafruit_DHT.read_retry(DHT_SENSOR, DHT_PIN)
+    try:
+        dht = get_dht()
+    except DeviceUnavailable:
+        return None, None
+    humidity, temperature = dht.read_retry(dht.DHT22, DHT_PIN)
     if humidity is not None and temperature is not None:
-        log_event(f"Temp: {temperature:.1f}°C, Humidity: {humidity:.1f}%")
         return temperature, humidity
     else:
         log_event("Failed to read DHT sensor")
         return None, None
 
 # === Flame Sensor ===
-flame_sensor = DigitalInputDevice(6)
+get_flame_sensor = device("flame", lambda: DigitalInputDevice(6))
 
 def read_flame():
     try:
-        if flame_sensor.value == 0:  # active LOW
-            log_event("🔥 Flame detected!")
-            return True
-        return False
+        return get_flame_sensor().value == 0  # active LOW
+    except DeviceUnavailable:
+        return None
     except Exception as e:
         log_event(f"Flame sensor error: {e}")
         return False
 
 # === Smoke Sensor (ADS1115 ADC) ===
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
+def _init_smoke_adc():
+    """Open I2C and put the ADS1115 in continuous mode on P0. Returns (ads, channel)."""
+    import board
+    import busio
+    import adafruit_ads1x15.ads1115 as ADS
+    from adafruit_ads1x15.ads1x15 import Mode
+    from adafruit_ads1x15.analog_in import AnalogIn
+
+    i2c = busio.I2C(board.SCL, board.SDA)
+    ads = ADS.ADS1115(i2c)
+    mq_channel = AnalogIn(ads, ADS.P0)
+
+    # Continuous conversion: the ADC keeps converting P0 and each read is a
+    # single register fetch instead of a trigger + wait + fetch.
+    ads.mode = Mode.CONTINUOUS
+    ads.data_rate = SMOKE_DATA_RATE
+    return ads, mq_channel
+
+get_smoke_adc = device("smoke_adc", _init_smoke_adc)
 
-i2c = busio.I2C(board.SCL, board.SDA)
-ads = ADS.ADS1115(i2c)
-mq_channel = AnalogIn(ads, ADS.P0)
+# Full-scale volts for each PGA gain setting
+ADS_FULL_SCALE = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
 
 SMOKE_THRESHOLD = None  # set after calibration
+SMOKE_BASELINE = None
+SMOKE_ANCHOR = None     # baseline of the last full calibration
 CALIBRATION_TIME = 30   # seconds
 
+smoke_filter = TrendFilter(SMOKE_MEDIAN_WINDOW, SMOKE_EWMA_ALPHA, SMOKE_ROR_WINDOW)
+_last_smoke_record = 0.0
+
 def read_smoke():
     try:
-        val = (mq_channel.voltage / ads.gain) if ads.gain else mq_channel.voltage
-        log_event(f"Smoke sensor voltage: {mq_channel.voltage:.3f}V (raw={mq_channel.value})")
-        return val
+        ads, mq_channel = get_smoke_adc()
+        raw = mq_channel.value  # one I2C transaction
+        voltage = raw * ADS_FULL_SCALE[ads.gain] / 32767
+        return (voltage / ads.gain) if ads.gain else voltage
+    except DeviceUnavailable:
+        return None
     except Exception as e:
         log_event(f"MQ sensor read error: {e}")
         return None
 
-def calibrate_smoke_sensor():
-    """Measure baseline in clean air and set threshold."""
-    global SMOKE_THRESHOLD
-    log_event("Calibrating smoke sensor... Keep sensor in clean air.")
-    readings = []
-    start_time = time()
-    while time() - start_time < CALIBRATION_TIME:
-        val = read_smoke()
-        if val is not None:
-            readings.append(val)
-        sleep(1)
-    if readings:
-        baseline = sum(readings) / len(readings)
-        SMOKE_THRESHOLD = baseline + 0.2  # add margin
-        log_event(f"Smoke sensor calibrated. Baseline={baseline:.3f}, Threshold={SMOKE_THRESHOLD:.3f}")
-    else:
-        SMOKE_THRESHOLD = 1.0  # fallback
-        log_event("Calibration failed, using default threshold=1.0V")
+def calibrate_smoke_sensor(readings):
+    """Take the first baseline: the median of clean-air readings."""
+    set_smoke_calibration(median(readings), full=True)
+
+def set_smoke_calibration(baseline, full=False):
+    """Apply a clean-air baseline and persist it for the next start.
+
+    A full calibration becomes the anchor; a rolling one may not move the
+    baseline more than SMOKE_MAX_DRIFT above it, so a slow smolder can't
+    walk the threshold up window by window.
+    """
+    global SMOKE_THRESHOLD, SMOKE_BASELINE, SMOKE_ANCHOR
+    if full or SMOKE_ANCHOR is None:
+        SMOKE_ANCHOR = baseline
+    elif baseline > SMOKE_ANCHOR + SMOKE_MAX_DRIFT:
+        log_event(f"Smoke baseline {baseline:.3f} capped at {SMOKE_ANCHOR + SMOKE_MAX_DRIFT:.3f} "
+                  f"(anchor {SMOKE_ANCHOR:.3f})")
+        baseline = SMOKE_ANCHOR + SMOKE_MAX_DRIFT
+    SMOKE_BASELINE = baseline
+    SMOKE_THRESHOLD = baseline + SMOKE_THRESHOLD_MARGIN
+    log_event(f"Smoke sensor calibrated. Baseline={baseline:.3f}, Threshold={SMOKE_THRESHOLD:.3f}")
+    try:
+        tmp = SMOKE_CALIBRATION_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"baseline": baseline, "threshold": SMOKE_THRESHOLD, "anchor": SMOKE_ANCHOR,
+                       "calibrated_at": time()}, f)
+        os.replace(tmp, SMOKE_CALIBRATION_FILE)
+    except Exception as e:
+        log_event(f"Error saving smoke calibration: {e}")
+
+def load_smoke_calibration():
+    """Use the saved baseline if it is recent enough. Returns True if loaded."""
+    global SMOKE_THRESHOLD, SMOKE_BASELINE, SMOKE_ANCHOR
+    try:
+        with open(SMOKE_CALIBRATION_FILE) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return False
+    age = time() - saved.get("calibrated_at", 0)
+    if age > SMOKE_CALIBRATION_MAX_AGE:
+        log_event(f"Saved smoke calibration is {age / 86400:.1f} days old, recalibrating")
+        return False
+    SMOKE_BASELINE = saved["baseline"]
+    SMOKE_THRESHOLD = saved["threshold"]
+    SMOKE_ANCHOR = saved.get("anchor", SMOKE_BASELINE)
+    log_event(f"Smoke calibration loaded ({age / 3600:.1f}h old). "
+              f"Baseline={SMOKE_BASELINE:.3f}, Threshold={SMOKE_THRESHOLD:.3f}")
+    return True
+
+# Rolling clean-air baseline, folded into a new calibration every
+# SMOKE_RECALIBRATE_INTERVAL seconds of clean samples
+_clean_air = {"sum": 0.0, "count": 0, "since": None}
+
+# Without a saved calibration the first baseline takes every sample for
+# CALIBRATION_TIME seconds: the default threshold says nothing about what
+# clean air reads on this particular sensor.
+_first_baseline = None  # {"since": monotonic time, "readings": [...]} while it runs
+
+def _track_clean_air(level, rise, now):
+    global _first_baseline
+    if _first_baseline is not None:
+        _first_baseline["readings"].append(level)
+        if now - _first_baseline["since"] >= CALIBRATION_TIME:
+            readings, _first_baseline = _first_baseline["readings"], None
+            calibrate_smoke_sensor(readings)
+        return
+    clean = (not _alarm_active["smoke"]
+             and level < SMOKE_THRESHOLD - SMOKE_THRESHOLD_MARGIN / 2
+             and abs(rise) < SMOKE_ROR_THRESHOLD / 2)
+    if not clean:
+        return
+    if _clean_air["since"] is None:
+        _clean_air["since"] = now
+    _clean_air["sum"] += level
+    _clean_air["count"] += 1
+    if now - _clean_air["since"] >= SMOKE_RECALIBRATE_INTERVAL:
+        set_smoke_calibration(_clean_air["sum"] / _clean_air["count"])
+        _clean_air.update(sum=0.0, count=0, since=None)
 
 # === Environment Monitoring ===
-def monitor_environment(interval=2):
-    """Continuously monitor temp, humidity, smoke, flame."""
-    if SMOKE_THRESHOLD is None:
-        calibrate_smoke_sensor()
-
-    while True:
-        temp, hum = read_temp_humidity()
-        smoke_val = read_smoke()
-        flame_detected = read_flame()
-
-        if smoke_val is not None and smoke_val > SMOKE_THRESHOLD:
-            log_event("🚨 Smoke threshold exceeded! Triggering alarm!")
-            buzzer_on()
-            light_on()
-            image_path = capture_image("smoke_alert")
-            
-            # Send emergency alert regardless of user authorization
-            send_sms(f"EMERGENCY: Smoke detected at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            if image_path:
-                send_image_mms(image_path, "EMERGENCY - Smoke detected")
-            
-            sleep(5)
-            buzzer_off()
-            light_off()
-
-        if flame_detected:
-            log_event("🚨 Flame detected! Triggering alarm!")
-            buzzer_on()
-            light_on()
-            image_path = capture_image("flame_alert")
-            
-            # Send emergency alert regardless of user authorization
-            send_sms(f"EMERGENCY: Flame detected at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            if image_path:
-                send_image_mms(image_path, "EMERGENCY - Flame detected")
-            
-            sleep(5)
-            buzzer_off()
-            light_off()
-
-        sleep(interval)
+# Latched alarms: alert once when a condition starts, re-arm when it clears.
+# The buzzer and light stay held for as long as the condition lasts.
+_alarm_active = {"smoke": False, "flame": False}
+_alarm_release = {}  # kind -> pending scheduler Job releasing its outputs
+
+def _raise_alarm(kind, label):
+    clip = trigger_recording(kind)
+    log_event(f"🚨 {label} Triggering alarm!", event_type=f"{kind}_alarm",
+              source="sensors", clip=clip)
+    _hold_alarm_outputs(kind)
+    image_path = capture_image(f"{kind}_alert")
+    
+    # Send emergency alert regardless of user authorization
+    report_alert(kind, sms_text=f"EMERGENCY: {kind.capitalize()} detected at {strftime('%Y-%m-%d %H:%M:%S')}",
+                 image_path=image_path, mms_caption=f"EMERGENCY - {kind.capitalize()} detected",
+                 priority=PRIORITY_EMERGENCY)
+
+def _hold_alarm_outputs(kind):
+    job = _alarm_release.pop(kind, None)
+    if job is not None:
+        job.cancel()  # came back before the release: stay on
+    hold_outputs(f"{kind}_alarm")
+
+def _release_alarm_outputs(kind):
+    _alarm_release.pop(kind, None)
+    if not _alarm_active[kind]:
+        release_outputs(f"{kind}_alarm")
+
+def _update_alarm(kind, active, label):
+    if active and not _alarm_active[kind]:
+        _alarm_active[kind] = True
+        _raise_alarm(kind, label)
+    elif not active and _alarm_active[kind]:
+        _alarm_active[kind] = False
+        log_event(f"{kind.capitalize()} cleared", event_type=f"{kind}_cleared", source="sensors")
+        # Keep sounding a little past the clear so a flickering sensor doesn't chirp
+        _alarm_release[kind] = call_later(ALARM_RESET_SECONDS, _release_alarm_outputs, kind,
+                                          key=f"{kind}_alarm_release")
+
+def handle_smoke_sample(smoke_val):
+    """Alarm on the filtered level, or early on a sustained fast rise."""
+    global _last_smoke_record
+    if smoke_val is None:
+        return
+    now = monotonic()
+    level = smoke_filter.update(smoke_val, now)
+    rise = smoke_filter.rate_of_rise()
+    if now - _last_smoke_record >= TS_SMOKE_RECORD_INTERVAL:
+        _last_smoke_record = now
+        record("smoke", level)
+
+    if level > SMOKE_THRESHOLD:
+        _update_alarm("smoke", True, f"Smoke threshold exceeded ({level:.3f}V)!")
+    elif (rise > SMOKE_ROR_THRESHOLD and SMOKE_BASELINE is not None
+          and level > SMOKE_BASELINE + SMOKE_ROR_MIN_MARGIN):
+        _update_alarm("smoke", True, f"Smoke rising fast ({rise * 1000:.0f}mV/s)!")
+    else:
+        _update_alarm("smoke", False, "")
+    _track_clean_air(level, rise, now)
+
+def handle_dht_sample(reading):
+    temperature, humidity = reading
+    t = time()
+    record("temperature", temperature, t)
+    record("humidity", humidity, t)
+
+def handle_flame_sample(flame_detected):
+    if flame_detected is None:
+        return
+    _update_alarm("flame", bool(flame_detected), "Flame detected!")
+
+def monitor_environment():
+    """Sample temp/humidity, smoke and flame, each at its own rate."""
+    global SMOKE_THRESHOLD, _first_baseline
+    add_sensor("flame", read_flame, FLAME_SAMPLE_INTERVAL, FLAME_SAMPLE_DEADLINE, handle_flame_sample)
+    add_sensor("dht", read_temp_humidity, DHT_SAMPLE_INTERVAL, DHT_SAMPLE_DEADLINE, handle_dht_sample,
+               blocking=True)  # read_retry bit-bangs for up to seconds
+
+    # Arm at once: use the saved calibration, or the default threshold while the
+    # first baseline is taken from the next CALIBRATION_TIME seconds of samples
+    if SMOKE_THRESHOLD is None and not load_smoke_calibration():
+        SMOKE_THRESHOLD = SMOKE_DEFAULT_THRESHOLD
+        _first_baseline = {"since": monotonic(), "readings": []}
+        log_event(f"No recent smoke calibration; armed with default threshold={SMOKE_DEFAULT_THRESHOLD}V, "
+                  f"calibrating in background")
+    add_sensor("smoke", read_smoke, SMOKE_SAMPLE_INTERVAL, SMOKE_SAMPLE_DEADLINE, handle_smoke_sample,
+               blocking=True)  # an I2C transaction per read
 
 def start_environment_monitor():
-    t_env = Thread(target=monitor_environment, args=(2,), daemon=True)
-    t_env.start()
\ No newline at end of file
+    if event_loop() is not None:
+        # The flame pin is read on the loop: open it here, off the loop
+        try:
+            get_flame_sensor()
+        except DeviceUnavailable:
+            pass
+        monitor_environment()  # only adds the sampling tasks
+        return
+    t_env = Thread(target=monitor_environment, daemon=True)
+    t_env.start()
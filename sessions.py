@@ -0,0 +1,139 @@
+"""
+Presence / session store.
+
+Writers (RFID scans, the CLI, expiry) serialize on one lock, build a new
+dict and publish it by rebinding _snapshot. The dict is never mutated once
+published, so readers on the motion hot path (is_anyone_present(),
+snapshot()) take no lock and always see a consistent set of sessions.
+
+Expiry is one keyed scheduler job armed for the earliest deadline; when it
+fires it ends every overdue session and publishes "session_expired" for
+each. Every change is written atomically to SESSIONS_FILE, and load()
+restores the sessions still within their deadline after a restart.
+"""
+import os
+import json
+import time
+import threading
+from config import SESSIONS_FILE, SESSION_DURATION
+from event_bus import publish
+from scheduler import call_later, reschedule
+from utils import log_event
+
+_lock = threading.Lock()
+_snapshot = {}   # uid -> {"name", "entry_time", "expires"}; replaced, never mutated
+_sweep_job = None
+_loaded = False
+
+def _save(sessions):
+    """Write sessions atomically. Caller holds _lock."""
+    try:
+        os.makedirs(os.path.dirname(SESSIONS_FILE), exist_ok=True)
+        tmp = SESSIONS_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(sessions, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, SESSIONS_FILE)
+    except OSError as e:
+        log_event(f"Error saving sessions: {e}")
+
+def _publish(sessions):
+    """Install a new snapshot, persist it and re-arm the sweeper. Caller holds _lock."""
+    global _snapshot
+    _snapshot = sessions
+    _save(sessions)
+    _arm_sweeper()
+
+def _arm_sweeper():
+    """Point the single expiry job at the earliest deadline. Caller holds _lock."""
+    global _sweep_job
+    if not _snapshot:
+        if _sweep_job is not None:
+            _sweep_job.cancel()
+            _sweep_job = None
+        return
+    delay = max(0.0, min(s["expires"] for s in _snapshot.values()) - time.time())
+    if _sweep_job is None or _sweep_job.cancelled:
+        _sweep_job = call_later(delay, _sweep, key="session_sweep")
+    else:
+        reschedule(_sweep_job, delay)
+
+def _sweep():
+    now = time.time()
+    with _lock:
+        expired = {uid: s for uid, s in _snapshot.items() if s["expires"] <= now}
+        if expired:
+            _publish({uid: s for uid, s in _snapshot.items() if uid not in expired})
+        else:
+            _arm_sweeper()
+    for uid, session in expired.items():
+        publish("session_expired", uid=uid, **session)
+
+def load():
+    """Restore sessions saved before a restart. Returns the restored sessions."""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return dict(_snapshot)
+        _loaded = True
+        try:
+            with open(SESSIONS_FILE) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        now = time.time()
+        restored = {uid: s for uid, s in saved.items() if s.get("expires", 0) > now}
+        _publish(restored)
+    if restored:
+        log_event(f"Restored {len(restored)} session(s): {', '.join(s['name'] for s in restored.values())}")
+    return restored
+
+def start_session(uid, name, duration=SESSION_DURATION):
+    """Mark `name` present. Returns False if that card already has a session."""
+    with _lock:
+        if uid in _snapshot:
+            return False
+        now = time.time()
+        sessions = dict(_snapshot)
+        sessions[uid] = {"name": name, "entry_time": now, "expires": now + duration}
+        _publish(sessions)
+        return True
+
+def end_session(uid):
+    """End one session. Returns it, or None if there was none."""
+    with _lock:
+        if uid not in _snapshot:
+            return None
+        sessions = dict(_snapshot)
+        session = sessions.pop(uid)
+        _publish(sessions)
+        return session
+
+def end_all():
+    """End every session. Returns {uid: session} of those ended."""
+    with _lock:
+        ended = _snapshot
+        if ended:
+            _publish({})
+        return ended
+
+# === Lock-free reads ===
+def snapshot():
+    """Current sessions {uid: session}; treat as read-only."""
+    return _snapshot
+
+def is_anyone_present():
+    return bool(_snapshot)
+
+def present_user_names():
+    """Comma-separated names of everyone present, or None."""
+    names = [s["name"] for s in _snapshot.values()]
+    return ", ".join(names) if names else None
+
+def find_by_name(name):
+    """UID of the session whose name matches (case-insensitive), or None."""
+    for uid, session in _snapshot.items():
+        if session["name"].lower() == name.lower():
+            return uid
+    return None
@@ -0,0 +1,321 @@
+"""
+Simulated hardware backends.
+
+install() registers stand-ins for every device accessor (see devices.py), so
+the whole system runs on any Linux box without gpiozero pins, the camera,
+the MFRC522, the DHT22, the ADS1115 or a SIM800L:
+
+    ScriptedPin      PIR / flame input; trigger() or play() a script of edges
+    SimOutput        light and buzzers; records every on/off with a timestamp
+    SyntheticCamera  generated frames; shows movement after a PIR trigger
+    FakeRFIDReader   MFRC522 + IRQ line; a card is in the field after scan(uid)
+    FakeADC          ADS1115 + channel; set_voltage() drives the smoke level
+    FakeDHT          Adafruit_DHT stand-in with steady readings
+    FakeSIM800L      pty-backed modem answering the AT commands gsm_module uses
+
+Run the system on simulated devices with SMART_HOME_DEVICES=sim, then drive
+them from the CLI ("sim pir1", "sim rfid <uid>", "sim smoke <volts>", ...).
+"""
+import os
+import pty
+import time
+import queue
+import threading
+import tty
+from collections import deque
+import numpy as np
+import devices
+
+class ScriptedPin:
+    """Digital input with gpiozero-style callbacks (when_motion / when_activated)."""
+
+    def __init__(self, name, idle=0):
+        self.name = name
+        self.idle = idle
+        self.value = idle
+        self.when_motion = None
+        self.when_activated = None
+        self.on_trigger = []  # extra hooks, e.g. make the synthetic camera see movement
+
+    def set(self, value):
+        rising = value != self.idle and self.value == self.idle
+        self.value = value
+        if rising:
+            for hook in self.on_trigger:
+                hook(self)
+            for callback in (self.when_motion, self.when_activated):
+                if callback:
+                    callback()
+
+    def trigger(self, hold=0.0):
+        """Drive the pin active (an edge) and, after `hold` seconds, back to idle."""
+        self.set(1 - self.idle)
+        if hold:
+            threading.Timer(hold, self.set, args=(self.idle,)).start()
+        else:
+            self.value = self.idle
+
+    def play(self, script):
+        """Replay [(delay_seconds, value), ...] on a background thread."""
+        def run():
+            for delay, value in script:
+                time.sleep(delay)
+                self.set(value)
+        threading.Thread(target=run, name=f"sim-{self.name}", daemon=True).start()
+
+class SimOutput:
+    """LED/buzzer stand-in that records state changes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.is_active = False
+        self.history = deque(maxlen=1000)  # (time, state)
+        self.on_change = []
+
+    def _set(self, state):
+        self.is_active = state
+        now = time.time()
+        self.history.append((now, state))
+        for hook in self.on_change:
+            hook(self, state, now)
+
+    def on(self):
+        self._set(True)
+
+    def off(self):
+        self._set(False)
+
+class SimServo:
+    def __init__(self):
+        self.value = None
+
+class SyntheticCamera:
+    """Frames of a static scene; a bright block moves across it while 'motion' is on."""
+
+    def __init__(self, width=640, height=480):
+        self.width = width
+        self.height = height
+        self.motion_until = 0.0
+        self._background = np.full((height, width, 3), 60, dtype=np.uint8)
+        self._background[height // 2:, :, :] = 90  # floor
+
+    def start(self):
+        pass
+
+    def add_motion(self, seconds=2.0):
+        self.motion_until = max(self.motion_until, time.time() + seconds)
+
+    def capture_array(self):
+        frame = self._background.copy()
+        now = time.time()
+        if now < self.motion_until:
+            size = self.height // 3
+            x = int((now * 200) % max(1, self.width - size))
+            frame[self.height // 3:self.height // 3 + size, x:x + size] = 220
+        return frame
+
+class FakeRFIDReader:
+    """SimpleMFRC522 stand-in; also serves as its own IRQ line and MFRC522 (READER)."""
+
+    def __init__(self):
+        self._scans = queue.Queue()
+        self.READER = self
+        self.when_activated = None
+
+    def scan(self, uid, text=""):
+        self._scans.put((int(uid), text))
+        if self.when_activated:
+            self.when_activated()
+
+    @property
+    def is_active(self):
+        return not self._scans.empty()
+
+    def read(self):
+        return self._scans.get()
+
+    def read_id_no_block(self):
+        try:
+            return self._scans.get_nowait()[0]
+        except queue.Empty:
+            return None
+
+    def wait_for_active(self, timeout=None):
+        """IRQ line: active while a card is waiting to be read. timeout=None waits forever."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._scans.empty():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def Write_MFRC522(self, addr, val):
+        pass
+
+    def MFRC522_Init(self):
+        pass
+
+class FakeADC:
+    """(ads, channel) pair for read_smoke(); the channel reports set_voltage()."""
+
+    FULL_SCALE = 4.096  # gain 1
+
+    def __init__(self, voltage=0.4):
+        self.gain = 1
+        self.voltage = voltage
+
+    def set_voltage(self, voltage):
+        self.voltage = voltage
+
+    @property
+    def value(self):
+        return int(max(0.0, min(self.voltage, self.FULL_SCALE)) / self.FULL_SCALE * 32767)
+
+class FakeDHT:
+    DHT22 = 22
+
+    def __init__(self, temperature=22.0, humidity=45.0):
+        self.temperature = temperature
+        self.humidity = humidity
+
+    def read_retry(self, sensor, pin):
+        return self.humidity, self.temperature
+
+class FakeSIM800L:
+    """SIM800L on a pty: answers AT, text-mode SMS (+CMGS) and MMS (+CMMSSEND).
+
+    Every accepted message is appended to `messages` and passed to the
+    `on_message` hooks. `send_delay` simulates network time per message.
+    """
+
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.messages = []
+        self.on_message = []
+        self._master = None
+        self.port = None
+
+    def start(self):
+        if self.port is None:
+            self._master, slave = pty.openpty()
+            tty.setraw(slave)
+            self.port = os.ttyname(slave)
+            threading.Thread(target=self._run, name="sim-sim800l", daemon=True).start()
+        return self.port
+
+    def _reply(self, data):
+        os.write(self._master, data)
+
+    def _accept(self, kind, number, body):
+        if self.send_delay:
+            time.sleep(self.send_delay)
+        message = {"kind": kind, "number": number, "size": len(body), "time": time.time()}
+        if kind == "sms":
+            message["text"] = body.decode(errors="replace")
+        self.messages.append(message)
+        for hook in self.on_message:
+            hook(message)
+        if kind == "sms":
+            self._reply(f"\r\n+CMGS: {len(self.messages)}\r\n\r\nOK\r\n".encode())
+        else:
+            self._reply(b"\r\nOK\r\n")
+
+    def _run(self):
+        buf = b""
+        body_for = None  # (kind, number) while collecting a message body
+        while True:
+            buf += os.read(self._master, 4096)
+            while True:
+                if body_for is not None:
+                    if b"\x1b" in buf and b"\x1a" not in buf.split(b"\x1b", 1)[0]:
+                        buf = buf.split(b"\x1b", 1)[1]  # ESC aborts
+                        body_for = None
+                        continue
+                    if b"\x1a" not in buf:
+                        break
+                    body, buf = buf.split(b"\x1a", 1)
+                    self._accept(body_for[0], body_for[1], body)
+                    body_for = None
+                    continue
+                if b"\r" not in buf:
+                    break
+                line, buf = buf.split(b"\r", 1)
+                cmd = line.strip().decode(errors="replace")
+                if not cmd:
+                    continue
+                if cmd.startswith("AT+CMGS="):
+                    body_for = ("sms", cmd.split("=", 1)[1].strip('"'))
+                    self._reply(b"\r\n> ")
+                elif cmd.startswith("AT+CMMSSEND="):
+                    body_for = ("mms", cmd.split("=", 1)[1].split(",")[0].strip('"'))
+                    self._reply(b"\r\n> ")
+                elif cmd.startswith("AT"):
+                    self._reply(b"\r\nOK\r\n")
+                else:
+                    self._reply(b"\r\nERROR\r\n")
+
+# === Installed instances (set by install()) ===
+pirs = {}
+flame = None
+light = None
+buzzers = ()
+camera = None
+rfid = None
+adc = None
+dht = None
+modem = None
+
+def install(modem_send_delay=0.0):
+    """Register the simulated backends. Call before any device is first used."""
+    global pirs, flame, light, buzzers, camera, rfid, adc, dht, modem
+    if modem is not None:
+        return
+    camera = SyntheticCamera()
+    pirs = {"pir1": ScriptedPin("pir1"), "pir2": ScriptedPin("pir2")}
+    for pin in pirs.values():
+        pin.on_trigger.append(lambda pin: camera.add_motion())
+    flame = ScriptedPin("flame", idle=1)  # active LOW
+    light = SimOutput("light")
+    buzzers = (SimOutput("buzzer1"), SimOutput("buzzer2"))
+    rfid = FakeRFIDReader()
+    adc = FakeADC()
+    dht = FakeDHT()
+    modem = FakeSIM800L(modem_send_delay)
+    devices.use_backend({
+        "pir": lambda: pirs,
+        "flame": lambda: flame,
+        "light": lambda: light,
+        "buzzers": lambda: buzzers,
+        "servo": SimServo,
+        "camera": lambda: camera,
+        "rfid": lambda: rfid,
+        "rfid_irq": lambda: rfid,
+        "smoke_adc": lambda: (adc, adc),
+        "dht": lambda: dht,
+        "modem": modem.start,
+    })
+
+def command(args):
+    """Handle the CLI 'sim ...' command. Returns a message to print."""
+    if modem is None:
+        return "Simulated devices are not installed (set SMART_HOME_DEVICES=sim)"
+    try:
+        target = args[0]
+        if target in pirs:
+            pirs[target].trigger()
+            return f"{target} triggered"
+        if target == "flame":
+            flame.trigger(hold=float(args[1]) if len(args) > 1 else 2.0)
+            return "Flame pulse"
+        if target == "rfid":
+            rfid.scan(args[1])
+            return f"Scanned {args[1]}"
+        if target == "smoke":
+            adc.set_voltage(float(args[1]))
+            return f"Smoke sensor at {adc.voltage:.2f}V"
+        if target == "sms":
+            return "\n".join(f"{m['kind']} to {m['number']}: {m.get('text', '%d bytes' % m['size'])}"
+                             for m in modem.messages[-10:]) or "No messages sent"
+    except (IndexError, ValueError):
+        pass
+    return "Usage: sim pir1|pir2 | sim flame [seconds] | sim rfid <uid> | sim smoke <volts> | sim sms"
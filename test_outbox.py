@@ -0,0 +1,43 @@
+"""Outbox journal recovery (run with: python -m pytest -q)."""
+import os
+import tempfile
+os.environ.setdefault("SMART_HOME_LOG_DIR", tempfile.mkdtemp())
+
+import pytest
+import outbox
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "outbox.jsonl")
+    monkeypatch.setattr(outbox, "OUTBOX_FILE", path)
+    _restart()
+    yield path
+    _restart()
+
+def _restart():
+    """Forget in-memory state, as after a process restart."""
+    if outbox._journal is not None:
+        outbox._journal.close()
+    outbox._journal = None
+    outbox._pending.clear()
+    outbox._next_id = 1
+    outbox._finished_since_compact = 0
+
+def test_append_after_torn_tail_survives_restart(journal):
+    first = outbox.add("sms", {"text": "one", "recipients": ["+1"]}, 0)
+    _restart()
+    with open(journal, "a") as f:
+        f.write('{"op": "add", "id": 5, "kind": "sms", "pri')  # crash mid-append
+    assert outbox.pending_count() == 1
+    second = outbox.add("sms", {"text": "two", "recipients": ["+1"]}, 0)
+    _restart()
+    assert outbox.pending_count() == 2
+    assert set(outbox._pending) == {first, second}
+
+def test_torn_only_line(journal):
+    with open(journal, "w") as f:
+        f.write('{"op": "add", "id": 1, "ki')
+    entry_id = outbox.add("sms", {"text": "x", "recipients": ["+1"]}, 0)
+    _restart()
+    assert outbox.pending_count() == 1
+    assert list(outbox._pending) == [entry_id]
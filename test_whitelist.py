@@ -0,0 +1,36 @@
+"""RFID whitelist journal recovery (run with: python -m pytest -q)."""
+import os
+import tempfile
+os.environ.setdefault("SMART_HOME_LOG_DIR", tempfile.mkdtemp())
+
+import pytest
+import whitelist
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "whitelist.jsonl")
+    monkeypatch.setattr(whitelist, "RFID_WHITELIST_FILE", path)
+    monkeypatch.setattr(whitelist, "RFID_LEGACY_FILE", str(tmp_path / "legacy.json"))
+    _restart()
+    yield path
+    _restart()
+
+def _restart():
+    """Forget in-memory state, as after a process restart."""
+    if whitelist._journal is not None:
+        whitelist._journal.close()
+    whitelist._journal = None
+    whitelist._cards.clear()
+    whitelist._by_name.clear()
+    whitelist._ops_since_compact = 0
+
+def test_add_after_torn_tail_survives_restart(journal):
+    whitelist.add("1", "Ann")
+    _restart()
+    with open(journal, "a") as f:
+        f.write('{"op": "add", "uid": "2", "na')  # crash mid-append
+    assert whitelist.add("3", "Bob")
+    _restart()
+    assert whitelist.lookup("1") == "Ann"
+    assert whitelist.lookup("3") == "Bob"
+    assert whitelist.lookup("2") is None
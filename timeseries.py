@@ -0,0 +1,220 @@
+"""
+Compact time-series storage for sensor readings.
+
+Each metric has three fixed-size rings, each a memory-mapped file of
+fixed-width NumPy records:
+
+    raw   (t, value)                       TS_RAW_CAPACITY points
+    1m    (t, min, max, mean, count)       TS_MINUTE_CAPACITY rows
+    1h    (t, min, max, mean, count)       TS_HOUR_CAPACITY rows
+
+Old data is overwritten in place, so the on-disk size never grows (about
+1.2 MB per metric with the defaults). The minute and hour buckets still
+being filled live in a small mapped .pending file, so a restart keeps them.
+Range queries are vectorized over the mapped arrays and pick the finest tier
+that still covers the range (or, early on, the one reaching back furthest).
+
+Usage:
+    python timeseries.py temperature --hours 48
+"""
+import os
+import sys
+import time
+import atexit
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+from config import TIMESERIES_DIR, TS_RAW_CAPACITY, TS_MINUTE_CAPACITY, TS_HOUR_CAPACITY
+
+RAW_DTYPE = np.dtype([("t", "<f8"), ("value", "<f4")])
+AGG_DTYPE = np.dtype([("t", "<f8"), ("min", "<f4"), ("max", "<f4"), ("mean", "<f4"), ("count", "<u4")])
+PENDING_DTYPE = np.dtype([("t", "<f8"), ("min", "<f4"), ("max", "<f4"), ("sum", "<f8"), ("count", "<u4")])
+HEADER_WORDS = 4  # capacity, head, count, record size
+
+METRICS = ("temperature", "humidity", "smoke")
+
+class Ring:
+    """Fixed-capacity ring of records in a memory-mapped file."""
+
+    def __init__(self, path, dtype, capacity):
+        self.dtype = dtype
+        header_bytes = HEADER_WORDS * 8
+        size = header_bytes + capacity * dtype.itemsize
+        fresh = not os.path.exists(path) or os.path.getsize(path) != size
+        if fresh:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self.header = np.memmap(path, dtype="<i8", mode="r+", shape=(HEADER_WORDS,))
+        if fresh or self.header[0] != capacity or self.header[3] != dtype.itemsize:
+            self.header[:] = (capacity, 0, 0, dtype.itemsize)
+        self.records = np.memmap(path, dtype=dtype, mode="r+", offset=header_bytes, shape=(capacity,))
+        self.capacity = capacity
+
+    def append(self, row):
+        head = int(self.header[1])
+        self.records[head] = row
+        self.header[1] = (head + 1) % self.capacity
+        self.header[2] = min(int(self.header[2]) + 1, self.capacity)
+
+    def ordered(self):
+        """All stored records, oldest first (a view when the ring hasn't wrapped)."""
+        head, count = int(self.header[1]), int(self.header[2])
+        if count < self.capacity:
+            return self.records[:count]
+        return np.concatenate((self.records[head:], self.records[:head]))
+
+    def query(self, start, end):
+        rows = self.ordered()
+        t = rows["t"]
+        return np.array(rows[(t >= start) & (t <= end)])
+
+    def oldest(self):
+        head, count = int(self.header[1]), int(self.header[2])
+        if count == 0:
+            return None
+        return float(self.records[(head - count) % self.capacity]["t"])
+
+    def flush(self):
+        self.header.flush()
+        self.records.flush()
+
+class Series:
+    """One metric: raw ring plus 1-minute and 1-hour downsampled rings."""
+
+    def __init__(self, name):
+        os.makedirs(TIMESERIES_DIR, exist_ok=True)
+        base = os.path.join(TIMESERIES_DIR, name)
+        self.name = name
+        self.lock = threading.Lock()
+        self.raw = Ring(base + ".raw", RAW_DTYPE, TS_RAW_CAPACITY)
+        self.tiers = [
+            (60, Ring(base + ".1m", AGG_DTYPE, TS_MINUTE_CAPACITY)),
+            (3600, Ring(base + ".1h", AGG_DTYPE, TS_HOUR_CAPACITY)),
+        ]
+        # In-progress bucket per tier (count 0 = none yet), kept across restarts
+        self.pending = _open_pending(base + ".pending", len(self.tiers))
+
+    def append(self, t, value):
+        with self.lock:
+            self.raw.append((t, value))
+            for i, (width, ring) in enumerate(self.tiers):
+                bucket = t - t % width
+                agg = self.pending[i]  # a view into the mapped file
+                if agg["count"] and agg["t"] != bucket:
+                    ring.append(_rollup(agg))
+                    agg["count"] = 0
+                if not agg["count"]:
+                    agg["t"], agg["min"], agg["max"], agg["sum"], agg["count"] = bucket, value, value, value, 1
+                else:
+                    agg["min"] = min(agg["min"], value)
+                    agg["max"] = max(agg["max"], value)
+                    agg["sum"] += value
+                    agg["count"] += 1
+
+    def query(self, start, end, tier=None):
+        """Return (tier_name, records) for [start, end].
+
+        Picks the finest tier that covers `start`. If none does yet, it picks
+        the finest tier reaching back to within one hour bucket of the
+        furthest one, so a young series answers from raw points. The bucket
+        still being filled is included for the 1m and 1h tiers.
+        """
+        with self.lock:
+            candidates = [("raw", self.raw), ("1m", self.tiers[0][1]), ("1h", self.tiers[1][1])]
+            if tier is None:
+                reach = [(ring.oldest(), name) for name, ring in candidates]
+                covering = [name for oldest, name in reach if oldest is not None and oldest <= start]
+                if covering:
+                    tier = covering[0]
+                else:
+                    furthest = min((oldest for oldest, _ in reach if oldest is not None), default=None)
+                    tier = "raw" if furthest is None else next(
+                        name for oldest, name in reach
+                        if oldest is not None and oldest <= furthest + self.tiers[-1][0])
+            recs = dict(candidates)[tier].query(start, end)
+            if tier != "raw":
+                agg = self.pending[[name for name, _ in candidates].index(tier) - 1]
+                if agg["count"] and start <= agg["t"] <= end:
+                    recs = np.append(recs, np.array([_rollup(agg)], dtype=AGG_DTYPE))
+            return tier, recs
+
+    def flush(self):
+        with self.lock:
+            self.raw.flush()
+            for _, ring in self.tiers:
+                ring.flush()
+            self.pending.flush()
+
+def _rollup(agg):
+    return (agg["t"], agg["min"], agg["max"], agg["sum"] / agg["count"], agg["count"])
+
+def _open_pending(path, n):
+    size = n * PENDING_DTYPE.itemsize
+    if not os.path.exists(path) or os.path.getsize(path) != size:
+        with open(path, "wb") as f:
+            f.truncate(size)
+    return np.memmap(path, dtype=PENDING_DTYPE, mode="r+", shape=(n,))
+
+_series = {}
+_series_lock = threading.Lock()
+
+def get_series(name):
+    with _series_lock:
+        if name not in _series:
+            _series[name] = Series(name)
+        return _series[name]
+
+def record(name, value, t=None):
+    """Store one reading for metric `name`."""
+    if value is None:
+        return
+    get_series(name).append(time.time() if t is None else t, float(value))
+
+def query(name, start, end=None, tier=None):
+    return get_series(name).query(start, time.time() if end is None else end, tier)
+
+def print_history(name, hours=24, rows=24):
+    """Print min/max/mean for `name` over the last `hours`, in `rows` buckets."""
+    end = time.time()
+    start = end - hours * 3600
+    tier, recs = query(name, start, end)
+    if len(recs) == 0:
+        print(f"No {name} data in the last {hours:g}h")
+        return
+    if tier == "raw":
+        lo, hi, mean, t = recs["value"], recs["value"], recs["value"], recs["t"]
+        weights = np.ones(len(recs))
+    else:
+        lo, hi, mean, t = recs["min"], recs["max"], recs["mean"], recs["t"]
+        weights = recs["count"].astype(np.float64)
+    print(f"{name} over {hours:g}h ({tier} tier, {len(recs)} points): "
+          f"min={lo.min():.2f} max={hi.max():.2f} mean={np.average(mean, weights=weights):.2f}")
+    edges = np.linspace(start, end, rows + 1)
+    idx = np.clip(np.searchsorted(edges, t, side="right") - 1, 0, rows - 1)
+    for b in range(rows):
+        sel = idx == b
+        if not sel.any():
+            continue
+        stamp = datetime.utcfromtimestamp(edges[b]).strftime("%m-%d %H:%M")
+        print(f"  {stamp}  min={lo[sel].min():8.2f}  max={hi[sel].max():8.2f}  "
+              f"mean={np.average(mean[sel], weights=weights[sel]):8.2f}")
+
+def flush_all():
+    with _series_lock:
+        series = list(_series.values())
+    for s in series:
+        s.flush()
+
+atexit.register(flush_all)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show stored sensor history")
+    parser.add_argument("metric", choices=METRICS)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--rows", type=int, default=24)
+    args = parser.parse_args(argv)
+    print_history(args.metric, args.hours, args.rows)
+
+if __name__ == "__main__":
+    sys.exit(main())
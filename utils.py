@@ -1,12 +1,211 @@
 import os
+import gzip
+import glob
+import queue
+import shutil
+import atexit
+import threading
+import time
+from threading import Thread
 from datetime import datetime
-from config import LOG_DIR
+import event_store
+from config import (LOG_DIR, LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL, LOG_BATCH_MAX, LOG_MAX_BYTES,
+                    LOG_MAX_AGE, LOG_BACKUP_COUNT)
 
 os.makedirs(LOG_DIR, exist_ok=True)
 
-def log_event(msg):
-    ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+LOG_FILE = os.path.join(LOG_DIR, "events.log")
+
+# Callers only enqueue; a single writer thread owns the file.
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_writer_thread = None
+_writer_lock = threading.Lock()
+_drop_lock = threading.Lock()
+dropped_events = 0
+
+def log_event(msg, **fields):
+    """Queue a log line and return immediately. Drops the line if the queue is full.
+
+    Optional keyword fields (event_type, source, zone, uid, image, clip) are stored
+    with the structured record in event_store.
+    """
+    global dropped_events
+    now = time.time()
+    ts = datetime.utcfromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
     line = f"{ts} UTC | {msg}"
-    print(line)
-    with open(os.path.join(LOG_DIR, "events.log"), "a") as f:
-        f.write(line + "\n")
+    _start_writer()
+    try:
+        _log_queue.put_nowait((line, event_store.make_record(now, msg, fields)))
+    except queue.Full:
+        with _drop_lock:
+            dropped_events += 1
+
+def flush_log(timeout=5):
+    """Block until everything queued so far has been written (used at shutdown)."""
+    if _writer_thread is None:
+        return True
+    done = threading.Event()
+    try:
+        _log_queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+def _start_writer():
+    global _writer_thread
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            t = Thread(target=_writer_loop, name="log-writer", daemon=True)
+            t.start()
+            _writer_thread = t
+
+def _take_dropped():
+    global dropped_events
+    with _drop_lock:
+        n, dropped_events = dropped_events, 0
+    return n
+
+def _writer_loop():
+    f = open(LOG_FILE, "a")
+    opened_at = time.time()
+    last_write = time.monotonic()
+    while True:
+        # Gather lines until LOG_FLUSH_INTERVAL has passed since the last write,
+        # LOG_BATCH_MAX are waiting or flush_log() is blocked, then write them at once
+        batch = []
+        waiters = []
+        while len(batch) < LOG_BATCH_MAX:
+            timeout = last_write + LOG_FLUSH_INTERVAL - time.monotonic() if batch else LOG_FLUSH_INTERVAL
+            try:
+                item = _log_queue.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                break
+            batch.append(item)
+            if isinstance(item, threading.Event):
+                break
+
+        lines = []
+        records = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                lines.append(item[0])
+                records.append(item[1])
+
+        dropped = _take_dropped()
+        if dropped:
+            ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"{ts} UTC | Log queue full, dropped {dropped} event(s)")
+
+        if lines:
+            text = "\n".join(lines) + "\n"
+            print(text, end="")
+            try:
+                f.write(text)
+                f.flush()
+            except Exception as e:
+                print(f"Log write error: {e}")
+            last_write = time.monotonic()
+            try:
+                event_store.append_records(records)
+            except Exception as e:
+                print(f"Event store write error: {e}")
+
+        for w in waiters:
+            w.set()
+
+        try:
+            if f.tell() >= LOG_MAX_BYTES or (f.tell() > 0 and time.time() - opened_at >= LOG_MAX_AGE):
+                f.close()
+                _rotate()
+                f = open(LOG_FILE, "a")
+                opened_at = time.time()
+        except Exception as e:
+            print(f"Log rotation error: {e}")
+            if f.closed:
+                f = open(LOG_FILE, "a")
+                opened_at = time.time()
+
+def _rotate():
+    """Move events.log aside and gzip it in the background."""
+    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    rotated = os.path.join(LOG_DIR, f"events.log.{ts}")
+    os.replace(LOG_FILE, rotated)
+    Thread(target=_compress_and_prune, args=(rotated,), name="log-gzip", daemon=True).start()
+
+def _compress_and_prune(path):
+    try:
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+    except Exception as e:
+        print(f"Log compression error: {e}")
+    # Keep only the newest LOG_BACKUP_COUNT archives so the SD card never fills
+    archives = sorted(glob.glob(os.path.join(LOG_DIR, "events.log.*.gz")))
+    for old in archives[:-LOG_BACKUP_COUNT] if LOG_BACKUP_COUNT > 0 else archives:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+# === Append-only journals ===
+def trim_torn_tail(path):
+    """Cut a journal back to its last complete line. Returns the bytes removed.
+
+    A crash mid-append leaves a fragment with no newline; appending after it
+    would glue the next record onto it and lose both.
+    """
+    try:
+        f = open(path, "rb+")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            step = min(4096, end)
+            f.seek(end - step)
+            nl = f.read(step).rfind(b"\n")
+            if nl != -1:
+                end = end - step + nl + 1
+                break
+            end -= step
+        if end < size:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+        return size - end
+
+# === asyncio runtime ===
+# Set by async_runtime when the system runs on one event loop. The scheduler,
+# event bus, sampler, camera, RFID reader and modem worker then start tasks on
+# it instead of threads; blocking driver calls go to the bounded driver pool.
+_event_loop = None
+_driver_pool = None
+
+def set_event_loop(loop, driver_pool=None):
+    global _event_loop, _driver_pool
+    _event_loop, _driver_pool = loop, driver_pool
+
+def event_loop():
+    """The runtime's event loop, or None under the thread runtime."""
+    return _event_loop
+
+def start_task(coro):
+    """Run a coroutine as a task on the runtime loop (from any thread). Returns a Future."""
+    import asyncio
+    future = asyncio.run_coroutine_threadsafe(coro, _event_loop)
+
+    def report(f):
+        if not f.cancelled() and f.exception() is not None:
+            log_event(f"Task {coro.__name__} failed: {f.exception()}")
+    future.add_done_callback(report)
+    return future
+
+async def run_blocking(func, *args):
+    """Run a blocking driver call (DHT, camera, SPI, serial bulk write) on the driver pool."""
+    return await _event_loop.run_in_executor(_driver_pool, func, *args)
+
+atexit.register(flush_log)
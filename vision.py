@@ -0,0 +1,38 @@
+"""
+NumPy-only image helpers shared by the camera code.
+
+Nothing here touches the camera, so it can be imported (and benchmarked)
+without the Pi hardware.
+"""
+import numpy as np
+
+# BT.601 luma weights for the first three channels
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+def estimate_brightness(frame, step=8):
+    """Mean luma (0-255) of a strided subsample of `frame`.
+
+    Works on a view of every `step`-th pixel, so it never builds a full-size
+    float image; only the per-channel means are computed in float.
+    """
+    sub = frame[::step, ::step]
+    if sub.ndim == 2:
+        return float(sub.mean())
+    channel_means = sub[..., :3].mean(axis=(0, 1))
+    if channel_means.shape[0] < 3:
+        return float(channel_means.mean())
+    return float(channel_means @ LUMA_WEIGHTS)
+
+def small_gray(frame, step=8):
+    """Downscaled grayscale (float32) of `frame` via striding, for cheap comparisons."""
+    sub = frame[::step, ::step]
+    if sub.ndim == 2:
+        return sub.astype(np.float32)
+    if sub.shape[2] < 3:
+        return sub[..., 0].astype(np.float32)
+    return (sub[..., 0] * np.float32(0.299) + sub[..., 1] * np.float32(0.587)
+            + sub[..., 2] * np.float32(0.114))
+
+def changed_fraction(gray, background, pixel_delta=25):
+    """Fraction of pixels that differ from the background by more than pixel_delta."""
+    return float(np.count_nonzero(np.abs(gray - background) > pixel_delta)) / gray.size
@@ -0,0 +1,159 @@
+"""
+RFID whitelist store.
+
+Keeps uid -> name plus a maintained index of name -> uids (names match
+case-insensitively), so lookups, per-card and per-user changes are O(1) in
+the number of registered cards. Every change is one fsync'd line appended
+to a JSON journal; after RFID_WHITELIST_COMPACT_AFTER changes the journal is
+rewritten atomically as a snapshot of the current cards. A crash can at
+worst lose the change it interrupted: a torn last line is cut off on load,
+before anything is appended after it.
+
+The old flat rfid_whitelist.json is imported on first load.
+"""
+import os
+import json
+import threading
+from config import RFID_WHITELIST_FILE, RFID_LEGACY_FILE, RFID_WHITELIST_COMPACT_AFTER
+from utils import log_event, trim_torn_tail
+
+_lock = threading.Lock()
+_cards = {}      # uid -> name
+_by_name = {}    # name.lower() -> {uid: None}, insertion ordered
+_journal = None
+_ops_since_compact = 0
+
+def _index_add(uid, name):
+    _cards[uid] = name
+    _by_name.setdefault(name.lower(), {})[uid] = None
+
+def _index_remove(uid):
+    name = _cards.pop(uid, None)
+    if name is not None:
+        uids = _by_name.get(name.lower())
+        uids.pop(uid, None)
+        if not uids:
+            del _by_name[name.lower()]
+    return name
+
+def _apply(rec):
+    op = rec["op"]
+    if op == "add":
+        _index_remove(rec["uid"])
+        _index_add(rec["uid"], rec["name"])
+    elif op == "remove":
+        _index_remove(rec["uid"])
+    elif op == "remove_user":
+        for uid in list(_by_name.get(rec["name"].lower(), ())):
+            _index_remove(uid)
+
+def _append(rec):
+    """Journal one change and apply it. Caller holds _lock."""
+    global _ops_since_compact
+    _journal.write(json.dumps(rec) + "\n")
+    _journal.flush()
+    os.fsync(_journal.fileno())
+    _apply(rec)
+    _ops_since_compact += 1
+    if _ops_since_compact >= RFID_WHITELIST_COMPACT_AFTER:
+        _compact()
+
+def _compact():
+    """Rewrite the journal as one add per card. Caller holds _lock."""
+    global _journal, _ops_since_compact
+    tmp = RFID_WHITELIST_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        for uid, name in _cards.items():
+            f.write(json.dumps({"op": "add", "uid": uid, "name": name}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    if _journal is not None:
+        _journal.close()
+    os.replace(tmp, RFID_WHITELIST_FILE)
+    _journal = open(RFID_WHITELIST_FILE, "a")
+    _ops_since_compact = 0
+
+def load():
+    """Replay the journal (importing the legacy JSON file the first time). Returns the card count."""
+    global _journal
+    with _lock:
+        if _journal is not None:
+            return len(_cards)
+        if trim_torn_tail(RFID_WHITELIST_FILE):
+            log_event("RFID whitelist: dropped a torn last journal line")
+        if os.path.exists(RFID_WHITELIST_FILE):
+            with open(RFID_WHITELIST_FILE) as f:
+                for line in f:
+                    try:
+                        _apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue  # corrupt line
+            _journal = open(RFID_WHITELIST_FILE, "a")
+            log_event(f"Loaded {len(_cards)} RFID cards from {RFID_WHITELIST_FILE}")
+        else:
+            if os.path.exists(RFID_LEGACY_FILE):
+                try:
+                    with open(RFID_LEGACY_FILE) as f:
+                        for uid, name in json.load(f).items():
+                            _index_add(str(uid), name)
+                    log_event(f"Imported {len(_cards)} RFID cards from {RFID_LEGACY_FILE}")
+                except Exception as e:
+                    log_event(f"Error loading RFID whitelist: {e}")
+            _compact()
+        return len(_cards)
+
+def _ensure_loaded():
+    if _journal is None:
+        load()
+
+def lookup(uid):
+    """Name the card is registered to, or None."""
+    _ensure_loaded()
+    return _cards.get(uid)
+
+def add(uid, name):
+    """Register a card. Returns False if it already belongs to someone."""
+    load()
+    with _lock:
+        if uid in _cards:
+            return False
+        _append({"op": "add", "uid": uid, "name": name})
+        return True
+
+def remove(uid):
+    """Unregister one card. Returns the name it belonged to, or None."""
+    load()
+    with _lock:
+        if uid not in _cards:
+            return None
+        name = _cards[uid]
+        _append({"op": "remove", "uid": uid})
+        return name
+
+def remove_user(name):
+    """Unregister every card of a user. Returns the removed uids."""
+    load()
+    with _lock:
+        uids = list(_by_name.get(name.lower(), ()))
+        if uids:
+            _append({"op": "remove_user", "name": name})
+        return uids
+
+def cards_for(name):
+    _ensure_loaded()
+    return list(_by_name.get(name.lower(), ()))
+
+def users():
+    """{name: [uids]} for every user with at least one card."""
+    _ensure_loaded()
+    with _lock:
+        return {_cards[next(iter(uids))]: list(uids) for uids in _by_name.values()}
+
+def items():
+    _ensure_loaded()
+    with _lock:
+        return list(_cards.items())
+
+def count():
+    _ensure_loaded()
+    return len(_cards)